@@ -0,0 +1,234 @@
+from flask import Blueprint, current_app, flash, redirect, render_template, request, url_for
+
+from database import read_only
+from models import db, Artist, Venue, Show, artist_genres
+from search import ranked_matches
+from search_index import artist_index
+from fragment_cache import fragment_cache
+from entity_cache import artist_cache
+from conditional import conditional
+from datetime_format import show_time_now
+from concurrent_queries import gather
+from log_pipeline import log_payload
+from queries import genres_named, filter_by_genre, listing_validators, detail_validators
+
+#----------------------------------------------------------------------------#
+# Artists.
+#----------------------------------------------------------------------------#
+
+bp = Blueprint('artists', __name__)
+
+
+@bp.route('/artists')
+def artists():
+    # Optionally only the artists of one genre
+    not_modified = conditional(*listing_validators(Artist))
+    if not_modified:
+        return not_modified
+    query = db.session.query(Artist.id, Artist.name)
+    genre = request.args.get('genre')
+    if genre:
+        query = filter_by_genre(query, Artist.id, artist_genres.c.artist_id, genre)
+    artists = query.order_by(Artist.id).all()
+    return render_template('pages/artists.html', artists=artists)
+
+
+@bp.route('/artists/search', methods=['POST'])
+@read_only
+def search_artists():
+    # Same indexed, ranked search as search_venues
+    search_term = request.form.get('search_term', '')
+    matches = ranked_matches(Artist, search_term, genre=request.form.get('genre'))
+    artists = db.session.query(
+        Artist.id,
+        Artist.name,
+        Artist.upcoming_shows_count
+    ).join(matches, matches.c.id == Artist.id).order_by(matches.c.rank, Artist.id).all()
+    response = {
+        "count": 0,
+        "data": []
+    }
+    for artist_id, name, num_upcoming_shows in artists:
+        a_obj = {
+            "id": artist_id,
+            "name": name,
+            "num_upcoming_shows": num_upcoming_shows
+        }
+        response["data"].append(a_obj)
+    response['count'] = len(response['data'])
+    return render_template('pages/search_artists.html', results=response, search_term=search_term)
+
+
+@bp.route('/artists/<int:artist_id>')
+def show_artist(artist_id):
+    # shows the artist page with the given artist_id
+    # Same as show_venue: the cached artist, and its shows with the venue
+    # columns
+    validators = detail_validators(Artist, Show.artist_id, artist_id)
+    if validators is None:
+        # Not even a cached copy is served for a row that is gone
+        flash('Artist not found!', 'error')
+        return redirect('/artists')
+    not_modified = conditional(*validators)
+    if not_modified:
+        return not_modified
+    # The version the ETag was built from
+    updated_at = validators[1]
+    shows = db.session.query(
+        Show.start_time,
+        Venue.id,
+        Venue.name,
+        Venue.image_link
+    ).join(Show.venue).filter(
+        Show.artist_id == artist_id
+    ).order_by(Show.start_time).all
+    artist = artist_cache.peek(artist_id, updated_at)
+    if artist is None:
+        rows, artist = gather(shows, lambda: artist_cache.get(artist_id, updated_at))
+    else:
+        rows = shows()
+    if artist is None:
+        # Deleted since the validators were read
+        flash('Artist not found!', 'error')
+        return redirect('/artists')
+
+    now = show_time_now()
+    past_shows = []
+    upcoming_shows = []
+    for start_time, venue_id, venue_name, venue_image_link in rows:
+        show = {
+            "venue_id": venue_id,
+            "venue_name": venue_name,
+            "venue_image_link": venue_image_link,
+            "start_time": start_time
+        }
+        if start_time > now:
+            upcoming_shows.append(show)
+        else:
+            past_shows.append(show)
+
+    data = {
+        "id": artist['id'],
+        "name": artist['name'],
+        "genres": artist['genres'],
+        "city": artist['city'],
+        "state": artist['state'],
+        "phone": artist['phone'],
+        "seeking_venue": artist['seeking_venue'],
+        "seeking_description": artist['seeking_description'],
+        "image_link": artist['image_link'],
+        "facebook_link": artist['facebook_link'],
+        "website": artist['website'],
+        "past_shows": past_shows,
+        "upcoming_shows": upcoming_shows,
+        "past_shows_count": len(past_shows),
+        "upcoming_shows_count": len(upcoming_shows)
+    }
+
+    return render_template('pages/show_artist.html', artist=data)
+
+#  Create Artist
+#  ----------------------------------------------------------------
+
+
+@bp.route('/artists/create', methods=['GET'])
+def create_artist_form():
+    from forms import ArtistForm
+    form = ArtistForm()
+    return render_template('forms/new_artist.html', form=form)
+
+
+@bp.route('/artists/create', methods=['POST'])
+def create_artist_submission():
+    # called upon submitting the new artist listing form
+    # TODO: insert form data as a new Venue record in the db, instead
+    # TODO: modify data to be the data object returned from db insertion
+    from forms import ArtistForm
+    form = ArtistForm()
+    try:
+        # on successful db insert, flash success
+        data = request.form
+        artist = Artist(
+            name=data['name'],
+            city=data['city'],
+            state=data['state'],
+            phone=data['phone'],
+            image_link=data['image_link'],
+            facebook_link=data['facebook_link'],
+            genres=genres_named(data.getlist('genres')),
+            website=data['website_link'],
+            seeking_description=data['seeking_description'],
+            #FIXME: Issue with dynamic data
+            seeking_venue=True
+        )
+
+        db.session.add(artist)
+        db.session.commit()
+        artist_index.add(artist)
+
+        log_payload(current_app.logger, 'New artist form', data)
+
+        flash('New artist ' +
+              request.form['name'] + ' was successfully created!')
+    except Exception:
+        # TODO on unsuccessful db insert, flash an error instead.
+        # e.g., flash('An error occurred. Artist ' + data.name + ' could not be listed.')
+        db.session.rollback()
+        flash('An error occurred. New artist ' +
+              request.form['name'] + ' could not be created.')
+        current_app.logger.exception('Could not create artist')
+        return render_template('forms/new_artist.html', form=form)
+    return render_template('pages/home.html', form=form)
+
+
+@bp.route('/artists/<int:artist_id>/edit', methods=['GET'])
+def edit_artist(artist_id):
+    from forms import ArtistForm
+    form = ArtistForm()
+    artist = artist_cache.get(artist_id)
+    if artist is None:
+        # Deleted since the validators were read
+        flash('Artist not found!', 'error')
+        return redirect('/artists')
+
+    # TODO: populate form with fields from artist with ID <artist_id>
+    return render_template('forms/edit_artist.html', form=form, artist=artist)
+
+
+@bp.route('/artists/<int:artist_id>/edit', methods=['POST'])
+def edit_artist_submission(artist_id):
+    # TODO: take values from the form submitted, and update existing
+    # artist record with ID <artist_id> using the new attributes
+    try:
+        artist = db.session.query(Artist).filter(
+            Artist.id == artist_id).first()
+        form_data = request.form
+        artist.name = form_data['name']
+        artist.city = form_data['city']
+        artist.state = form_data['state']
+        artist.phone = form_data['phone']
+        artist.genres = genres_named(form_data.getlist('genres'))
+        artist.image_link = form_data['image_link']
+        artist.facebook_link = form_data['facebook_link']
+        artist.website = form_data['website_link']
+        artist.seeking_venue = True
+        artist.seeking_description = form_data['seeking_description']
+
+        log_payload(current_app.logger, 'Edited artist form', form_data)
+        # on successful db insert, flash success
+        db.session.add(artist)
+        db.session.commit()
+        artist_index.update(artist)
+        fragment_cache.invalidate('artist', artist_id)
+        flash('Artist ' + request.form['name'] + ' was successfully updated!')
+    # TODO on unsuccessful db insert, flash an error instead.
+    # e.g., flash('An error occurred. Artist ' + data.name + ' could not be listed.')
+    except:
+        db.session.rollback()
+        flash('An error occurred. Artist ' +
+              request.form['name'] + ' could not be updated.')
+        current_app.logger.exception('Could not update artist %s', artist_id)
+    finally:
+        db.session.close()
+
+    return redirect(url_for('artists.show_artist', artist_id=artist_id))
@@ -0,0 +1,146 @@
+import json
+import platform
+import time
+from datetime import datetime
+from urllib.parse import urlencode
+
+import sqlalchemy
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from models import db, Artist, Venue, Show
+from query_plans import route_requests
+
+#----------------------------------------------------------------------------#
+# Route benchmarks.
+#----------------------------------------------------------------------------#
+
+# Requests below this many milliseconds slower than the baseline are noise
+NOISE_FLOOR_MS = 1.0
+
+
+def write_requests(venue_id, artist_id):
+    # Form posts for the create and edit routes. DELETE /venues/<id> is left
+    # out: every iteration would need a fresh venue.
+    venue = {'name': 'Benchmark Hall', 'city': 'Austin', 'state': 'TX',
+             'address': '1 Main St', 'phone': '512-555-0100', 'image_link': '',
+             'facebook_link': '', 'genres': ['Jazz', 'Blues'], 'website_link': '',
+             'seeking_description': ''}
+    artist = dict(venue, name='Benchmark Band')
+    del artist['address']
+    return [
+        ('POST', '/venues/create', venue),
+        ('POST', '/artists/create', artist),
+        ('POST', '/shows/create', {'artist_id': artist_id, 'venue_id': venue_id,
+                                   'start_time': '2030-01-01 20:00:00'}),
+        ('POST', '/venues/{}/edit'.format(venue_id), venue),
+        ('POST', '/artists/{}/edit'.format(artist_id), artist),
+    ]
+
+
+def percentile(values, q):
+    # Nearest-rank percentile of a sorted list
+    index = max(0, min(len(values) - 1, int(round(q / 100.0 * len(values) + 0.5)) - 1))
+    return values[index]
+
+
+def summarize(timings, queries):
+    timings = sorted(timings)
+    return {
+        'p50_ms': round(percentile(timings, 50) * 1000, 3),
+        'p90_ms': round(percentile(timings, 90) * 1000, 3),
+        'p99_ms': round(percentile(timings, 99) * 1000, 3),
+        'mean_ms': round(sum(timings) / len(timings) * 1000, 3),
+        'max_ms': round(timings[-1] * 1000, 3),
+        'queries': max(queries),
+    }
+
+
+def run_benchmarks(app, iterations=20, warmup=2):
+    '''
+    Request every route of ``app`` ``iterations`` times through the test
+    client, after ``warmup`` untimed requests, and return the latency
+    percentiles and the number of SQL statements of each. Reads run before
+    writes, so they see the catalog as generated.
+    '''
+    with app.app_context():
+        requests = route_requests(app)
+        venue_id = db.session.query(db.func.min(Venue.id)).scalar()
+        artist_id = db.session.query(db.func.min(Artist.id)).scalar()
+        requests += write_requests(venue_id, artist_id)
+        meta = {
+            'time': datetime.utcnow().isoformat(timespec='seconds') + 'Z',
+            'dialect': db.engine.dialect.name,
+            'venues': Venue.query.count(),
+            'artists': Artist.query.count(),
+            'shows': Show.query.count(),
+            'iterations': iterations,
+            'python': platform.python_version(),
+            'sqlalchemy': sqlalchemy.__version__,
+        }
+
+    app.config['WTF_CSRF_ENABLED'] = False
+    client = app.test_client()
+    # Builds the in-memory search indexes before anything is timed
+    client.get('/')
+
+    statements = [0]
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        statements[0] += 1
+
+    routes = {}
+    event.listen(Engine, 'after_cursor_execute', count)
+    try:
+        for method, url, data in requests:
+            timings = []
+            queries = []
+            for i in range(warmup + iterations):
+                statements[0] = 0
+                started = time.perf_counter()
+                response = client.open(url, method=method, data=data)
+                # Streamed bodies run their queries while being read
+                response.get_data()
+                elapsed = time.perf_counter() - started
+                if i >= warmup:
+                    timings.append(elapsed)
+                    queries.append(statements[0])
+            route = '{} {}'.format(method, url)
+            if route in routes:
+                # The same route with other form data, e.g. a filtered search
+                route += ' ' + urlencode(data, doseq=True)
+            routes[route] = dict(
+                summarize(timings, queries), status=response.status_code)
+    finally:
+        event.remove(Engine, 'after_cursor_execute', count)
+    return {'meta': meta, 'routes': routes}
+
+
+def compare(results, baseline, tolerance=0.25):
+    '''
+    Return (route, metric, baseline value, value) for every route that got
+    more than ``tolerance`` slower at the median or runs more statements
+    than in ``baseline``.
+    '''
+    regressions = []
+    for route, current in results['routes'].items():
+        previous = baseline['routes'].get(route)
+        if previous is None:
+            continue
+        if current['queries'] > previous['queries']:
+            regressions.append((route, 'queries', previous['queries'], current['queries']))
+        if (current['p50_ms'] > previous['p50_ms'] * (1 + tolerance)
+                and current['p50_ms'] - previous['p50_ms'] > NOISE_FLOOR_MS):
+            regressions.append((route, 'p50_ms', previous['p50_ms'], current['p50_ms']))
+    return regressions
+
+
+def load_results(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_results(results, path):
+    with open(path, 'w') as f:
+        json.dump(results, f, indent=2, sort_keys=True)
+        f.write('\n')
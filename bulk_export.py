@@ -0,0 +1,93 @@
+import csv
+import io
+import json
+import zlib
+
+from models import db, Artist, Venue, Show, Genre, artist_genres, venue_genres
+
+#----------------------------------------------------------------------------#
+# Bulk export.
+#----------------------------------------------------------------------------#
+
+# Rows fetched per round trip from the server-side cursor
+FETCH_SIZE = 2000
+# Rows serialized into one output chunk
+CHUNK_ROWS = 500
+
+EXPORT_KINDS = ('venues', 'artists', 'shows')
+EXPORT_FORMATS = ('jsonl', 'csv')
+
+
+def export_query(kind):
+    '''
+    Return (column names, query) for one export kind, in primary key order.
+    '''
+    if kind == 'shows':
+        columns = [Show.id, Show.start_time, Show.artist_id, Show.venue_id]
+        return [column.name for column in columns], db.session.query(*columns).order_by(Show.id)
+    model, association_id = {
+        'venues': (Venue, venue_genres.c.venue_id),
+        'artists': (Artist, artist_genres.c.artist_id),
+    }[kind]
+    columns = list(model.__table__.columns)
+    association = association_id.table
+    # Genre names of each row, ';'-joined like the import format expects
+    if db.engine.dialect.name == 'postgresql':
+        names = db.func.string_agg(Genre.name, ';')
+    else:
+        names = db.func.group_concat(Genre.name, ';')
+    genres = db.session.query(names).select_from(association).join(
+        Genre, Genre.id == association.c.genre_id
+    ).filter(association_id == model.id).scalar_subquery()
+    query = db.session.query(*columns, genres.label('genres')).order_by(model.id)
+    return [column.name for column in columns] + ['genres'], query
+
+
+def _serialize(value):
+    return value.isoformat() if hasattr(value, 'isoformat') else value
+
+
+def export_chunks(kind, format='jsonl'):
+    '''
+    Yield the rows of one export kind as JSONL or CSV text chunks. Rows are
+    read through a server-side cursor (yield_per), so memory stays flat
+    however large the table is.
+    '''
+    names, query = export_query(kind)
+    buffer = io.StringIO()
+    writer = csv.writer(buffer) if format == 'csv' else None
+    if writer:
+        writer.writerow(names)
+    pending = 0
+    for row in query.yield_per(FETCH_SIZE):
+        if writer:
+            writer.writerow([_serialize(value) for value in row])
+        else:
+            buffer.write(json.dumps(dict(zip(names, (_serialize(value) for value in row)))))
+            buffer.write('\n')
+        pending += 1
+        if pending == CHUNK_ROWS:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+            pending = 0
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def encode_chunks(chunks, compress=False, level=6):
+    '''
+    Encode text chunks to UTF-8, gzip-compressing them on the fly when
+    ``compress`` is set.
+    '''
+    if not compress:
+        for chunk in chunks:
+            yield chunk.encode('utf-8')
+        return
+    # wbits=31 writes a gzip header and trailer
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode('utf-8'))
+        if data:
+            yield data
+    yield compressor.flush()
@@ -0,0 +1,245 @@
+import csv
+import io
+import json
+import time
+from datetime import datetime
+from itertools import islice
+
+import dateutil.parser
+
+from models import db, Artist, Venue, Show, Genre, artist_genres, venue_genres, note_changes
+from counters import count_new_shows
+from datetime_format import to_show_time
+
+#----------------------------------------------------------------------------#
+# Bulk import.
+#----------------------------------------------------------------------------#
+
+# Columns read from import files, per kind. "genres" is ';'-separated, as in
+# the old string columns; shows reference their artist and venue either by
+# artist_id/venue_id or by artist_name/venue_name.
+VENUE_COLUMNS = ('name', 'city', 'state', 'address', 'phone', 'image_link',
+                 'facebook_link', 'website', 'seeking_talent', 'seeking_description')
+ARTIST_COLUMNS = ('name', 'city', 'state', 'phone', 'image_link', 'facebook_link',
+                  'website', 'seeking_venue', 'seeking_description')
+SHOW_COLUMNS = ('start_time', 'artist_id', 'venue_id')
+BOOLEAN_COLUMNS = {'seeking_talent', 'seeking_venue'}
+
+ENTITIES = {
+    'venues': (Venue, VENUE_COLUMNS, venue_genres.c.venue_id),
+    'artists': (Artist, ARTIST_COLUMNS, artist_genres.c.artist_id),
+}
+
+
+class ImportStats:
+    def __init__(self, kind):
+        self.kind = kind
+        self.rows = 0
+        self.skipped = 0
+        self.started = time.perf_counter()
+
+    @property
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    def report(self):
+        return '{}: imported {} rows, skipped {}, in {:.1f}s ({:.0f} rows/s)'.format(
+            self.kind, self.rows, self.skipped, self.elapsed,
+            self.rows / self.elapsed if self.elapsed else 0)
+
+
+def read_records(path, format=None):
+    '''
+    Stream dicts from a CSV (with a header row) or JSONL file, one at a time.
+    '''
+    if format is None:
+        format = 'csv' if path.lower().endswith('.csv') else 'jsonl'
+    with open(path, newline='', encoding='utf-8') as f:
+        if format == 'csv':
+            yield from csv.DictReader(f)
+        else:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+
+def batches(records, size):
+    records = iter(records)
+    while True:
+        batch = list(islice(records, size))
+        if not batch:
+            return
+        yield batch
+
+
+def parse_boolean(value):
+    if isinstance(value, bool) or value is None:
+        return value
+    return str(value).strip().lower() in ('1', 'true', 't', 'yes', 'y')
+
+
+def parse_datetime(value):
+    # Show times are stored naive, in SHOW_TIMEZONE: a value with an offset
+    # is converted to it
+    if not isinstance(value, datetime):
+        try:
+            value = datetime.fromisoformat(value)
+        except ValueError:
+            value = dateutil.parser.parse(value)
+    return to_show_time(value)
+
+
+def empty_to_none(value):
+    return None if value == '' else value
+
+
+#  Writing
+#  ----------------------------------------------------------------
+
+
+def _copy_value(value):
+    # COPY ... FROM STDIN text format
+    if value is None:
+        return '\\N'
+    if isinstance(value, bool):
+        return 't' if value else 'f'
+    if isinstance(value, datetime):
+        value = value.isoformat(' ')
+    return str(value).replace('\\', '\\\\').replace('\t', '\\t').replace(
+        '\n', '\\n').replace('\r', '\\r')
+
+
+def insert_rows(table, columns, rows):
+    '''
+    Insert ``rows`` (tuples in ``columns`` order) into ``table``: through COPY
+    on PostgreSQL, as a single executemany elsewhere.
+    '''
+    if not rows:
+        return
+    if db.engine.dialect.name == 'postgresql':
+        buffer = io.StringIO()
+        for row in rows:
+            buffer.write('\t'.join(_copy_value(value) for value in row))
+            buffer.write('\n')
+        buffer.seek(0)
+        cursor = db.session.connection().connection.cursor()
+        cursor.copy_expert('COPY "{}" ({}) FROM STDIN'.format(
+            table.name, ', '.join('"{}"'.format(column) for column in columns)), buffer)
+        # Behind the session's back, see bump_table_versions()
+        note_changes(db.session, table.name)
+    else:
+        db.session.execute(table.insert(), [dict(zip(columns, row)) for row in rows])
+
+
+def allocate_ids(model, count):
+    '''
+    Reserve ``count`` primary keys for ``model``, so rows can be inserted
+    with their ids known up front (COPY and executemany return none).
+    '''
+    table = model.__table__
+    if db.engine.dialect.name == 'postgresql':
+        return [entity_id for entity_id, in db.session.execute(
+            db.text("SELECT nextval(pg_get_serial_sequence(:table, 'id')) "
+                    "FROM generate_series(1, :count)"),
+            {'table': '"{}"'.format(table.name), 'count': count})]
+    # Elsewhere the import is expected to be the only writer
+    start = db.session.query(db.func.coalesce(db.func.max(model.id), 0)).scalar()
+    return list(range(start + 1, start + count + 1))
+
+
+class GenreResolver:
+    def __init__(self):
+        self.ids = {name: genre_id for genre_id, name in db.session.query(Genre.id, Genre.name)}
+
+    def __call__(self, names):
+        ids = []
+        for name in {name.strip() for name in (names or '').split(';') if name.strip()}:
+            if name not in self.ids:
+                genre = Genre(name=name)
+                db.session.add(genre)
+                db.session.flush()
+                self.ids[name] = genre.id
+            ids.append(self.ids[name])
+        return ids
+
+
+#  Importers
+#  ----------------------------------------------------------------
+
+
+def import_entities(kind, records, batch_size):
+    model, columns, association_id = ENTITIES[kind]
+    association = association_id.table
+    genre_ids = GenreResolver()
+    stats = ImportStats(kind)
+    for batch in batches(records, batch_size):
+        named = [record for record in batch if record.get('name')]
+        stats.skipped += len(batch) - len(named)
+        batch = named
+        ids = allocate_ids(model, len(batch))
+        rows = []
+        links = []
+        for entity_id, record in zip(ids, batch):
+            rows.append((entity_id,) + tuple(
+                parse_boolean(record.get(column)) if column in BOOLEAN_COLUMNS
+                else empty_to_none(record.get(column))
+                for column in columns))
+            genres = record.get('genres')
+            if isinstance(genres, list):
+                genres = ';'.join(genres)
+            links.extend((entity_id, genre_id) for genre_id in genre_ids(genres))
+        insert_rows(model.__table__, ('id',) + columns, rows)
+        insert_rows(association, (association_id.name, 'genre_id'), links)
+        db.session.commit()
+        stats.rows += len(rows)
+    return stats
+
+
+def _resolve(model, records, id_key, name_key):
+    # One query per batch and model: existing ids, and the lowest id per name
+    ids = {int(record[id_key]) for record in records if record.get(id_key)}
+    names = {record[name_key] for record in records
+             if not record.get(id_key) and record.get(name_key)}
+    known_ids = {entity_id for entity_id, in db.session.query(model.id).filter(
+        model.id.in_(ids))} if ids else set()
+    by_name = dict(db.session.query(model.name, db.func.min(model.id)).filter(
+        model.name.in_(names)).group_by(model.name)) if names else {}
+
+    def resolve(record):
+        if record.get(id_key):
+            entity_id = int(record[id_key])
+            return entity_id if entity_id in known_ids else None
+        return by_name.get(record.get(name_key))
+    return resolve
+
+
+def import_shows(records, batch_size):
+    stats = ImportStats('shows')
+    table = Show.__table__
+    for batch in batches(records, batch_size):
+        artist_of = _resolve(Artist, batch, 'artist_id', 'artist_name')
+        venue_of = _resolve(Venue, batch, 'venue_id', 'venue_name')
+        rows = []
+        for record in batch:
+            artist_id = artist_of(record)
+            venue_id = venue_of(record)
+            if artist_id is None or venue_id is None or not record.get('start_time'):
+                stats.skipped += 1
+                continue
+            rows.append((parse_datetime(record['start_time']), artist_id, venue_id))
+        insert_rows(table, SHOW_COLUMNS, rows)
+        count_new_shows([(artist_id, venue_id, start_time) for start_time, artist_id, venue_id in rows])
+        db.session.commit()
+        stats.rows += len(rows)
+    return stats
+
+
+def import_file(kind, path, format=None, batch_size=5000):
+    '''
+    Import a venues, artists or shows file in batches of ``batch_size`` rows,
+    committing after each batch. Returns the ImportStats.
+    '''
+    records = read_records(path, format)
+    if kind == 'shows':
+        return import_shows(records, batch_size)
+    return import_entities(kind, records, batch_size)
@@ -0,0 +1,183 @@
+import json
+
+import click
+
+from models import db, Artist, Venue
+from counters import rollover_shows
+from datetime_format import benchmark_datetime_format
+from bulk_export import EXPORT_KINDS, EXPORT_FORMATS, export_chunks, encode_chunks
+from static_assets import build_assets
+from template_cache import precompile_templates
+
+#----------------------------------------------------------------------------#
+# Commands.
+#----------------------------------------------------------------------------#
+
+# create_app() registers the commands on every start, so the modules only
+# some commands need, and everything they import (dateutil, the benchmark
+# and replay machinery), are imported when the command runs.
+
+
+def register_commands(app):
+    '''
+    Add the maintenance, data and benchmark commands to ``app``'s CLI.
+    '''
+    @app.cli.command('rollover-shows')
+    def rollover_shows_command():
+        """Move shows that have started from the upcoming to the past counters."""
+        moved = rollover_shows()
+        db.session.commit()
+        click.echo('Rolled over {} shows'.format(moved))
+
+    @app.cli.command('import')
+    @click.argument('kind', type=click.Choice(['venues', 'artists', 'shows']))
+    @click.argument('path', type=click.Path(exists=True, dir_okay=False))
+    @click.option('--format', type=click.Choice(['csv', 'jsonl']), help='Defaults to the file extension.')
+    @click.option('--batch-size', default=5000, show_default=True)
+    def import_command(kind, path, format, batch_size):
+        """Bulk import venues, artists or shows from a CSV or JSONL file."""
+        from bulk_import import import_file
+        stats = import_file(kind, path, format, batch_size)
+        click.echo(stats.report())
+
+    @app.cli.command('export')
+    @click.argument('kind', type=click.Choice(EXPORT_KINDS))
+    @click.option('--format', type=click.Choice(EXPORT_FORMATS), default='jsonl', show_default=True)
+    @click.option('--gzip', 'compress', is_flag=True, help='Gzip the output on the fly.')
+    @click.option('--output', type=click.File('wb'), default='-', help='Defaults to stdout.')
+    def export_command(kind, format, compress, output):
+        """Stream every venue, artist or show row as JSONL or CSV."""
+        for data in encode_chunks(export_chunks(kind, format), compress):
+            output.write(data)
+
+    @app.cli.command('check-query-plans')
+    def check_query_plans_command():
+        """Fail if any route fully scans a large table of the database, read only."""
+        from query_plans import check_query_plans
+        if not (Venue.query.first() and Artist.query.first()):
+            raise click.ClickException('The database has no venues or artists to request')
+        violations = check_query_plans(app)
+        for method, url, endpoint, tables, statement, plan in violations:
+            click.echo('{} {} ({}) scans {}:\n{}\n{}\n'.format(
+                method, url, endpoint, ', '.join(tables), statement, plan))
+        if violations:
+            raise SystemExit(1)
+        click.echo('No full scans of large tables')
+
+    @app.cli.command('build-assets')
+    def build_assets_command():
+        '''Fingerprint and precompress the static files into static/dist/.'''
+        manifest = build_assets(app.static_folder)
+        click.echo('Built {} assets'.format(len(manifest)))
+
+    @app.cli.command('precompile-templates')
+    def precompile_templates_command():
+        '''Compile every template into the bytecode cache (TEMPLATE_CACHE_DIR).'''
+        if not app.jinja_env.bytecode_cache:
+            raise click.ClickException('TEMPLATE_CACHE_DIR is not set')
+        click.echo('Compiled {} templates'.format(len(precompile_templates(app))))
+
+    @app.cli.command('generate-data')
+    @click.option('--shows', default=10000, show_default=True, help='From 1k to 1M.')
+    @click.option('--venues', type=int, help='Defaults to one per 20 shows.')
+    @click.option('--artists', type=int, help='Defaults to one per 10 shows.')
+    @click.option('--seed', default=42, show_default=True)
+    def generate_data_command(shows, venues, artists, seed):
+        """Fill an empty database with a deterministic synthetic catalog."""
+        from synthetic_data import generate
+        if Venue.query.first() or Artist.query.first():
+            raise click.ClickException('The database already has venues or artists')
+        shows, venues, artists = generate(shows, venues, artists, seed)
+        click.echo('Generated {} venues, {} artists and {} shows'.format(venues, artists, shows))
+
+    @app.cli.command('benchmark')
+    @click.option('--iterations', default=20, show_default=True)
+    @click.option('--output', type=click.Path(dir_okay=False), help='Save the results as JSON.')
+    @click.option('--baseline', type=click.Path(exists=True, dir_okay=False),
+                  help='Fail on regressions against these saved results.')
+    @click.option('--tolerance', default=0.25, show_default=True,
+                  help='Allowed median slowdown against the baseline.')
+    def benchmark_command(iterations, output, baseline, tolerance):
+        """Measure latency percentiles and query counts of every route."""
+        from benchmarks import run_benchmarks, compare, load_results, save_results
+        results = run_benchmarks(app, iterations)
+        for route, result in results['routes'].items():
+            click.echo('{:<45} {:>4} p50 {:>9.3f}ms  p90 {:>9.3f}ms  p99 {:>9.3f}ms  {:>3} queries'.format(
+                route, result['status'], result['p50_ms'], result['p90_ms'], result['p99_ms'], result['queries']))
+        if output:
+            save_results(results, output)
+        if baseline:
+            regressions = compare(results, load_results(baseline), tolerance)
+            for route, metric, previous, current in regressions:
+                click.echo('REGRESSION {} {}: {} -> {}'.format(route, metric, previous, current))
+            if regressions:
+                raise SystemExit(1)
+
+    @app.cli.command('startup-benchmark')
+    @click.option('--runs', default=10, show_default=True)
+    @click.option('--path', default='/', show_default=True, help='URL of the first request.')
+    @click.option('--imports', default=0, help='Also list the slowest N imports.')
+    @click.option('--output', type=click.Path(dir_okay=False), help='Save the results as JSON.')
+    @click.option('--baseline', type=click.Path(exists=True, dir_okay=False),
+                  help='Fail on regressions against these saved results.')
+    @click.option('--tolerance', default=0.25, show_default=True,
+                  help='Allowed median slowdown against the baseline.')
+    def startup_benchmark_command(runs, path, imports, output, baseline, tolerance):
+        """Measure the time a fresh process takes to import, create and serve the app."""
+        from benchmarks import load_results, save_results
+        from startup import measure_startup, slowest_imports, compare_startup
+        results = measure_startup(runs, path)
+        for phase, value in results['phases'].items():
+            click.echo('{:<20} {:>9.3f}ms'.format(phase, value))
+        for module, value in slowest_imports(imports, path) if imports else ():
+            click.echo('import {:<33} {:>9.3f}ms'.format(module, value))
+        if output:
+            save_results(results, output)
+        if baseline:
+            regressions = compare_startup(results, load_results(baseline), tolerance)
+            for phase, previous, current in regressions:
+                click.echo('REGRESSION {}: {} -> {}'.format(phase, previous, current))
+            if regressions:
+                raise SystemExit(1)
+
+    @app.cli.command('datetime-benchmark')
+    @click.option('--shows', default=500, show_default=True, help='Distinct show times per page.')
+    @click.option('--renders', default=20, show_default=True)
+    @click.option('--format', default='full', show_default=True)
+    def datetime_benchmark_command(shows, renders, format):
+        """Compare the datetime template filter with its former implementation."""
+        results = benchmark_datetime_format(shows, renders, format)
+        for name, value in results.items():
+            click.echo('{:<10} {:>9.3f}us per date  {:>7.1f}x'.format(name, value, results['reference'] / value))
+
+    @app.cli.command('traffic-log')
+    @click.option('--requests', 'count', default=10000, show_default=True)
+    @click.option('--seed', default=42, show_default=True)
+    @click.option('--output', type=click.File('w'), default='-', help='Defaults to stdout.')
+    def traffic_log_command(count, seed, output):
+        """Write a synthetic JSONL log of mixed browse, search and create traffic."""
+        from replay import traffic_log
+        for record in traffic_log(count, seed):
+            output.write(json.dumps(record) + '\n')
+
+    @app.cli.command('replay')
+    @click.argument('log', type=click.Path(exists=True, dir_okay=False))
+    @click.option('--concurrency', default=4, show_default=True)
+    @click.option('--rate', type=float, help='Requests per second; as fast as possible by default.')
+    @click.option('--url', help='Base URL of a running server; in-process by default.')
+    @click.option('--limit', type=int, help='Replay only the first LIMIT requests.')
+    @click.option('--output', type=click.Path(dir_okay=False), help='Save the report as JSON.')
+    def replay_command(log, concurrency, rate, url, limit, output):
+        """Replay a JSONL request log and report throughput, latency and errors per endpoint."""
+        from benchmarks import save_results
+        from replay import read_log, replay
+        stats = replay(app, read_log(log, limit), concurrency, rate, url)
+        if stats.skipped:
+            click.echo('Skipped {} records of writes without form data'.format(stats.skipped), err=True)
+        report = stats.report()
+        for endpoint, result in report.items():
+            click.echo('{:<25} {:>7} req {:>8.1f} req/s  p50 {:>9.3f}ms  p95 {:>9.3f}ms  p99 {:>9.3f}ms  {:>6.2%} errors'.format(
+                endpoint, result['requests'], result['rps'], result['p50_ms'],
+                result['p95_ms'], result['p99_ms'], result['error_rate']))
+        if output:
+            save_results(report, output)
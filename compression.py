@@ -0,0 +1,152 @@
+import zlib
+
+from werkzeug.datastructures import Headers
+from werkzeug.http import parse_accept_header, parse_cache_control_header
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+#----------------------------------------------------------------------------#
+# Response compression.
+#----------------------------------------------------------------------------#
+
+# WSGI middleware compressing text responses on the fly, with brotli (if
+# installed), gzip or deflate, whichever the client prefers. Streamed
+# responses (no Content-Length) stay streamed: every chunk is flushed
+# through the compressor as it comes. Bodies already encoded, e.g. the
+# precompressed static assets, and bodies below a minimum size pass through.
+
+COMPRESSIBLE_TYPES = {
+    'text/html', 'text/css', 'text/plain', 'text/csv', 'text/javascript',
+    'application/javascript', 'application/json', 'application/x-ndjson',
+    'application/xml', 'image/svg+xml',
+}
+
+
+class Compressor:
+    '''
+    Streaming compressor for one response body in ``encoding``.
+    '''
+
+    def __init__(self, encoding, level, brotli_quality):
+        self.encoding = encoding
+        if encoding == 'br':
+            self.compressor = brotli.Compressor(quality=brotli_quality)
+        else:
+            # wbits=31 writes a gzip header and trailer, 15 a zlib stream,
+            # which is what HTTP calls deflate
+            self.compressor = zlib.compressobj(level, zlib.DEFLATED, 31 if encoding == 'gzip' else 15)
+
+    def compress(self, data, flush=False):
+        if self.encoding == 'br':
+            return self.compressor.process(data) + (self.compressor.flush() if flush else b'')
+        return self.compressor.compress(data) + (self.compressor.flush(zlib.Z_SYNC_FLUSH) if flush else b'')
+
+    def finish(self):
+        if self.encoding == 'br':
+            return self.compressor.finish()
+        return self.compressor.flush()
+
+
+def weaken_etag(headers):
+    # The compressed bytes differ from the identity ones, the content does
+    # not: a weak ETag still matches If-None-Match (see conditional.py)
+    etag = headers.get('ETag')
+    if etag and not etag.startswith('W/'):
+        headers['ETag'] = 'W/' + etag
+
+
+class CompressionMiddleware:
+    def __init__(self, app, level=6, min_size=500, brotli_quality=4):
+        self.app = app
+        self.level = level
+        self.min_size = min_size
+        self.brotli_quality = brotli_quality
+        self.encodings = ('br', 'gzip', 'deflate') if brotli is not None else ('gzip', 'deflate')
+
+    def negotiate(self, environ):
+        accepted = parse_accept_header(environ.get('HTTP_ACCEPT_ENCODING', ''))
+        qualities = {encoding: accepted[encoding] for encoding in self.encodings if accepted[encoding]}
+        if not qualities:
+            return None
+        # Best quality first, then our order of preference
+        return max(self.encodings, key=lambda encoding: (qualities.get(encoding, 0), -self.encodings.index(encoding)))
+
+    def compressible(self, environ, status, headers):
+        if environ['REQUEST_METHOD'] == 'HEAD' or int(status.split(' ', 1)[0]) in (204, 206, 304):
+            return False
+        if 'Content-Encoding' in headers or 'Content-Range' in headers:
+            return False
+        if 'no-transform' in parse_cache_control_header(headers.get('Cache-Control')):
+            return False
+        length = headers.get('Content-Length', type=int)
+        return length is None or length >= self.min_size
+
+    def __call__(self, environ, start_response):
+        encoding = self.negotiate(environ)
+        state = {}
+
+        def compressing_start_response(status, headers, exc_info=None):
+            state['started'] = True
+            state.pop('compressor', None)
+            headers = Headers(headers)
+            not_modified = status.startswith('304')
+            # A 304 carries no Content-Type, but stands for a response that
+            # may well have been compressed
+            if not not_modified and headers.get('Content-Type', '').split(';')[0].strip() not in COMPRESSIBLE_TYPES:
+                return start_response(status, headers.to_wsgi_list(), exc_info)
+            # Whether or not this one is compressed, the response depends on
+            # Accept-Encoding
+            vary = headers.get('Vary')
+            if not vary or 'accept-encoding' not in vary.lower():
+                headers['Vary'] = vary + ', Accept-Encoding' if vary else 'Accept-Encoding'
+            if encoding is not None and not_modified:
+                weaken_etag(headers)
+            if encoding is None or not self.compressible(environ, status, headers):
+                return start_response(status, headers.to_wsgi_list(), exc_info)
+
+            compressor = state['compressor'] = Compressor(encoding, self.level, self.brotli_quality)
+            # Without a length the app streams, so every chunk is flushed
+            state['streamed'] = 'Content-Length' not in headers
+            headers.remove('Content-Length')
+            headers['Content-Encoding'] = encoding
+            weaken_etag(headers)
+            write = start_response(status, headers.to_wsgi_list(), exc_info)
+            return lambda data: write(compressor.compress(data, flush=True))
+
+        body = self.app(environ, compressing_start_response)
+        if state.get('started') and 'compressor' not in state:
+            # Passed through untouched, e.g. a file the server can send
+            # with wsgi.file_wrapper
+            return body
+        return self.compressed(body, state)
+
+    def compressed(self, body, state):
+        try:
+            for chunk in body:
+                compressor = state.get('compressor')
+                if compressor is None:
+                    yield chunk
+                elif chunk:
+                    data = compressor.compress(chunk, flush=state['streamed'])
+                    if data:
+                        yield data
+            compressor = state.get('compressor')
+            if compressor is not None:
+                yield compressor.finish()
+        finally:
+            if hasattr(body, 'close'):
+                body.close()
+
+
+def init_compression(app):
+    '''
+    Compress ``app``'s text responses, as configured by COMPRESSION_LEVEL,
+    COMPRESSION_MIN_SIZE and COMPRESSION_BROTLI_QUALITY.
+    '''
+    config = app.config
+    app.wsgi_app = CompressionMiddleware(
+        app.wsgi_app, config['COMPRESSION_LEVEL'], config['COMPRESSION_MIN_SIZE'],
+        config['COMPRESSION_BROTLI_QUALITY'])
@@ -0,0 +1,82 @@
+import os
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import copy_current_request_context, current_app, g
+
+#----------------------------------------------------------------------------#
+# Concurrent queries.
+#----------------------------------------------------------------------------#
+
+# Independent lookups of one request, e.g. a venue and its shows, run side
+# by side on a small per-process thread pool, each in its own session and
+# pooled connection. The driver releases the GIL while it waits on the
+# database, so a request waits for its slowest lookup instead of the sum of
+# all of them. Each app has a pool of its own, in app.extensions.
+#
+# Only the venue and artist pages have such lookups, on an entity cache
+# miss. The searches are a single statement. The listings read their
+# validators first on purpose: content read alongside them could be older
+# than the table versions its ETag names, and then be answered 304 until
+# the next write (see conditional.py).
+
+
+class QueryPool:
+    def __init__(self, size=0):
+        self.start(size)
+        pools.add(self)
+
+    def start(self, size):
+        self.size = size
+        self.executor = ThreadPoolExecutor(size, thread_name_prefix='query') if size > 0 else None
+
+    def gather(self, *calls):
+        '''
+        Call every one of ``calls`` and return their results in order. The
+        first runs in the calling thread, the others on the pool, within a
+        copy of the request context and of ``g``.
+        '''
+        if self.executor is None or len(calls) < 2:
+            return [call() for call in calls]
+        # The copied request context comes with a new app context, and so an
+        # empty g: replica routing (database.py) and the SQL profile read
+        # theirs from the request's
+        request_g = vars(g).copy()
+
+        def in_request(call):
+            @copy_current_request_context
+            def run():
+                vars(g).update(request_g)
+                return call()
+            return run
+        futures = [self.executor.submit(in_request(call)) for call in calls[1:]]
+        results = [calls[0]()]
+        results.extend(future.result() for future in futures)
+        return results
+
+
+# Live pools; a forked worker inherits them but not their threads
+pools = weakref.WeakSet()
+
+
+def _restart_pools_in_child():
+    for pool in list(pools):
+        pool.start(pool.size)
+
+
+os.register_at_fork(after_in_child=_restart_pools_in_child)
+
+
+def gather(*calls):
+    '''
+    QueryPool.gather() on the current app's pool.
+    '''
+    return current_app.extensions['query_pool'].gather(*calls)
+
+
+def init_concurrent_queries(app):
+    '''
+    Start QUERY_CONCURRENCY threads per process for gather(), or none to
+    run every lookup in the request's thread.
+    '''
+    app.extensions['query_pool'] = QueryPool(app.config['QUERY_CONCURRENCY'])
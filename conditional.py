@@ -0,0 +1,124 @@
+import hashlib
+import os
+from datetime import timezone
+
+from flask import Response, current_app, g, request, session
+from werkzeug.local import LocalProxy
+
+from static_assets import load_manifest, manifest_path
+
+#----------------------------------------------------------------------------#
+# Conditional GET.
+#----------------------------------------------------------------------------#
+
+# Pages whose content is a function of a few cheap validators, e.g. the
+# updated_at of a row, are answered with 304 Not Modified when the client's
+# If-None-Match (or, without one, If-Modified-Since) still matches, before
+# anything is rendered:
+#
+#   not_modified = conditional(*db.session.query(...).one())
+#   if not_modified:
+#       return not_modified
+#
+# The first validator is the time of the last change, used as Last-Modified.
+# It must advance with every change of the page: If-Modified-Since is
+# answered from it alone.
+# The ETag also covers the full request path, the templates and the static
+# asset manifest, so a deploy that changes the markup changes every ETag, as
+# does editing a template while template auto-reload (debug mode) is on.
+# Each app has a ConditionalGet of its own, in app.extensions; conditional
+# is the current app's.
+
+
+class ConditionalGet:
+    def __init__(self, markup_digest=''):
+        self.markup_digest = markup_digest
+
+    def __call__(self, last_modified, *validators):
+        '''
+        Return a 304 response if the client's copy of the page is still
+        current, or None after noting the validators for the response.
+        '''
+        if request.method not in ('GET', 'HEAD') or '_flashes' in session:
+            # Flashed messages are rendered into the page once
+            return None
+        digest = hashlib.sha1(self.markup_digest.encode())
+        digest.update(request.full_path.encode())
+        digest.update(repr((last_modified,) + validators).encode())
+        etag = digest.hexdigest()
+        if last_modified is not None:
+            # HTTP dates have a resolution of one second
+            last_modified = last_modified.replace(microsecond=0, tzinfo=timezone.utc)
+        g.conditional = (etag, last_modified)
+
+        if request.if_none_match:
+            current = request.if_none_match.contains_weak(etag)
+        else:
+            since = request.if_modified_since
+            current = since is not None and last_modified is not None and last_modified <= since
+        if not current:
+            return None
+        response = Response(status=304)
+        self.set_headers(response)
+        return response
+
+    def set_headers(self, response):
+        etag, last_modified = g.pop('conditional')
+        response.set_etag(etag)
+        if last_modified is not None:
+            response.last_modified = last_modified
+        # Caches may keep the page but must revalidate it on every use
+        response.cache_control.no_cache = True
+        return response
+
+    def after_request(self, response):
+        if 'conditional' in g and response.status_code == 200:
+            self.set_headers(response)
+        return response
+
+
+conditional = LocalProxy(lambda: current_app.extensions['conditional'])
+
+
+def markup_paths(app):
+    return ([os.path.join(app.jinja_loader.searchpath[0], name)
+             for name in sorted(app.jinja_loader.list_templates())]
+            + [manifest_path(app.static_folder)])
+
+
+def markup_digest(app):
+    '''
+    Return the digest of ``app``'s templates and static asset manifest,
+    read once or, with template auto-reload on, again whenever one of them
+    changes on disk.
+    '''
+    stamp = None
+    if app.templates_auto_reload:
+        stamp = tuple(os.stat(path).st_mtime_ns if os.path.exists(path) else None
+                      for path in markup_paths(app))
+    cached = app.extensions.get('markup_digest')
+    if cached is not None and cached[0] == stamp:
+        return cached[1]
+    digest = hashlib.sha1()
+    for name in sorted(app.jinja_loader.list_templates()):
+        with open(os.path.join(app.jinja_loader.searchpath[0], name), 'rb') as f:
+            digest.update(name.encode())
+            digest.update(f.read())
+    # Pages link to the hashed names of the static files
+    digest.update(repr(sorted(load_manifest(app.static_folder).items())).encode())
+    app.extensions['markup_digest'] = (stamp, digest.hexdigest())
+    return digest.hexdigest()
+
+
+def init_conditional(app):
+    '''
+    Add the validators noted by conditional() to ``app``'s responses.
+    '''
+    conditional = app.extensions['conditional'] = ConditionalGet(markup_digest(app))
+    app.after_request(conditional.after_request)
+
+    @app.before_request
+    def reload_markup_digest():
+        # Edited templates change the ETags right away
+        if app.templates_auto_reload:
+            conditional.markup_digest = markup_digest(app)
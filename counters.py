@@ -0,0 +1,136 @@
+from datetime import datetime
+
+from datetime_format import show_time_now
+from models import db, Artist, Venue, Show, ShowRollover
+
+#----------------------------------------------------------------------------#
+# Show counters.
+#----------------------------------------------------------------------------#
+
+# Artist.upcoming_shows_count/past_shows_count and the Venue equivalents are
+# denormalized counts of the entity's shows, split at the single
+# ShowRollover.rolled_over_at watermark rather than at "now": a show is
+# upcoming while its start_time is after the watermark. Every write
+# classifies shows against the same watermark, and rollover_shows() moves it
+# forward, so the counters never double count a show that starts between two
+# rollovers.
+#
+# Counter updates also bump updated_at: the detail pages list the entity's
+# shows, split into upcoming and past.
+
+COUNTED = ((Artist, Show.artist_id), (Venue, Show.venue_id))
+
+
+def rollover_state(lock=False, read=False):
+    '''
+    Return the ShowRollover row, creating it if the table is empty. With
+    ``lock`` the row is locked for the rest of the transaction (shared when
+    ``read`` is set) on backends that support row locks.
+    '''
+    query = ShowRollover.query
+    if lock:
+        query = query.with_for_update(read=read)
+    state = query.first()
+    if state is None:
+        # Nothing has been counted yet, so every show is still "upcoming"
+        state = ShowRollover(id=1, rolled_over_at=datetime.min)
+        db.session.add(state)
+        db.session.flush()
+    return state
+
+
+def _shift(model, fk, criterion, changes):
+    # One correlated UPDATE per model: for every entity with shows matching
+    # ``criterion``, add sign * count(shows) to each column in ``changes``.
+    counts = {
+        column: (sign, db.session.query(db.func.count(Show.id)).filter(
+            fk == model.id, criterion, *extra).scalar_subquery())
+        for column, (sign, extra) in changes.items()
+    }
+    values = {
+        column: getattr(model, column) + sign * count
+        for column, (sign, count) in counts.items()
+    }
+    values['updated_at'] = datetime.utcnow()
+    db.session.query(model).filter(
+        model.id.in_(db.session.query(fk).filter(criterion))
+    ).update(values, synchronize_session=False)
+
+
+def count_new_show(show):
+    '''
+    Add a not yet committed show to its artist's and venue's counters, in the
+    same transaction.
+    '''
+    watermark = rollover_state(lock=True, read=True).rolled_over_at
+    column = 'upcoming_shows_count' if show.start_time > watermark else 'past_shows_count'
+    for model, fk in COUNTED:
+        entity_id = show.artist_id if model is Artist else show.venue_id
+        db.session.query(model).filter(model.id == entity_id).update(
+            {column: getattr(model, column) + 1, 'updated_at': datetime.utcnow()},
+            synchronize_session=False)
+
+
+def count_new_shows(shows):
+    '''
+    Bulk version of count_new_show() for (artist_id, venue_id, start_time)
+    tuples: one executemany UPDATE per model instead of one per show.
+    '''
+    watermark = rollover_state(lock=True, read=True).rolled_over_at
+    now = datetime.utcnow()
+    for model, position in ((Artist, 0), (Venue, 1)):
+        counts = {}
+        for show in shows:
+            upcoming, past = counts.get(show[position], (0, 0))
+            if show[2] > watermark:
+                upcoming += 1
+            else:
+                past += 1
+            counts[show[position]] = (upcoming, past)
+        if not counts:
+            continue
+        table = model.__table__
+        db.session.execute(
+            table.update().where(table.c.id == db.bindparam('entity_id')).values(
+                upcoming_shows_count=table.c.upcoming_shows_count + db.bindparam('upcoming'),
+                past_shows_count=table.c.past_shows_count + db.bindparam('past'),
+                updated_at=now),
+            [{'entity_id': entity_id, 'upcoming': upcoming, 'past': past}
+             for entity_id, (upcoming, past) in counts.items()])
+
+
+def uncount_shows(criterion):
+    '''
+    Remove the shows matching ``criterion`` from their artists' and venues'
+    counters. Call this in the transaction that deletes them, before the
+    delete.
+    '''
+    watermark = rollover_state(lock=True, read=True).rolled_over_at
+    for model, fk in COUNTED:
+        _shift(model, fk, criterion, {
+            'upcoming_shows_count': (-1, [Show.start_time > watermark]),
+            'past_shows_count': (-1, [Show.start_time <= watermark])
+        })
+
+
+def rollover_shows(now=None):
+    '''
+    Move every show that started since the last rollover from the upcoming to
+    the past counters and advance the watermark to ``now``. Returns the number
+    of shows moved; the caller commits.
+    '''
+    if now is None:
+        now = show_time_now()
+    state = rollover_state(lock=True)
+    if now <= state.rolled_over_at:
+        return 0
+    started = db.and_(Show.start_time > state.rolled_over_at, Show.start_time <= now)
+    moved = db.session.query(db.func.count(Show.id)).filter(started).scalar()
+    if moved:
+        for model, fk in COUNTED:
+            _shift(model, fk, started, {
+                'upcoming_shows_count': (-1, []),
+                'past_shows_count': (1, [])
+            })
+    state.rolled_over_at = now
+    return moved
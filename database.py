@@ -0,0 +1,192 @@
+import os
+import threading
+import time
+import weakref
+
+from flask import current_app, g, has_request_context, request, session
+from flask_sqlalchemy import SQLAlchemy, SignallingSession, get_state
+from sqlalchemy import exc, orm
+from sqlalchemy.pool import QueuePool
+
+#----------------------------------------------------------------------------#
+# Database.
+#----------------------------------------------------------------------------#
+
+# Bind key of the optional read replica, see DATABASE_REPLICA_URL
+REPLICA_BIND = 'replica'
+
+READ_METHODS = ('GET', 'HEAD')
+
+
+def read_only(view):
+    '''
+    Mark ``view`` as only reading whatever its method, e.g. a search form
+    posted with POST: its statements may go to the replica, and it does not
+    send the client to the primary for REPLICA_STICKY_SECONDS.
+    '''
+    view.read_only = True
+    return view
+
+
+def is_read_only():
+    # Whether the current request only reads
+    if request.method in READ_METHODS:
+        return True
+    return getattr(current_app.view_functions.get(request.endpoint), 'read_only', False)
+
+# Live apps and the SQLAlchemy instance bound to each, whose pools a forked
+# worker drops. Registered once per process, not per app, so the apps can
+# be freed.
+forked_pools = weakref.WeakKeyDictionary()
+
+
+def _dispose_pools_in_child():
+    # A forked worker must not share the parent's connections; they are
+    # dropped without closing them, as the parent still owns them
+    for app, sqlalchemy in list(forked_pools.items()):
+        sqlalchemy.dispose_pools(app, close=False)
+
+
+os.register_at_fork(after_in_child=_dispose_pools_in_child)
+
+
+class PoolStats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def record(self, wait, timed_out=False):
+        with self.lock:
+            if timed_out:
+                self.timeouts += 1
+                return
+            self.checkouts += 1
+            self.total_wait += wait
+            self.max_wait = max(self.max_wait, wait)
+
+    def as_dict(self):
+        with self.lock:
+            return {
+                'checkouts': self.checkouts,
+                'timeouts': self.timeouts,
+                'total_wait_ms': round(self.total_wait * 1000, 3),
+                'avg_wait_ms': round(self.total_wait * 1000 / self.checkouts, 3) if self.checkouts else 0.0,
+                'max_wait_ms': round(self.max_wait * 1000, 3),
+            }
+
+
+class TimedQueuePool(QueuePool):
+    '''
+    QueuePool that records how long every checkout waited for a connection
+    (including opening a new one) and how many timed out.
+    '''
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.stats = PoolStats()
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except exc.TimeoutError:
+            self.stats.record(time.perf_counter() - started, timed_out=True)
+            raise
+        self.stats.record(time.perf_counter() - started)
+        return connection
+
+    def recreate(self):
+        pool = super().recreate()
+        pool.stats = self.stats
+        return pool
+
+
+class RoutingSession(SignallingSession):
+    '''
+    Session that sends the statements of read-only requests to the replica
+    bind, when one is configured. Flushes always go to the primary.
+    '''
+
+    def get_bind(self, mapper=None, clause=None, **kwargs):
+        if (not self._flushing and has_request_context()
+                and g.get('use_replica') and REPLICA_BIND in self.app.config['SQLALCHEMY_BINDS']):
+            return get_state(self.app).db.get_engine(self.app, bind=REPLICA_BIND)
+        return super().get_bind(mapper, clause)
+
+
+class RoutingSQLAlchemy(SQLAlchemy):
+    def create_session(self, options):
+        return orm.sessionmaker(class_=RoutingSession, db=self, **options)
+
+    def init_app(self, app):
+        app.config.setdefault('SQLALCHEMY_BINDS', {})
+        super().init_app(app)
+        forked_pools[app] = self
+
+        @app.before_request
+        def route_reads_to_replica():
+            # Reads go to the replica, except for a short while after this
+            # client wrote, so it reads its own writes despite replica lag
+            g.use_replica = is_read_only() and time.time() >= session.get('primary_until', 0)
+
+        @app.after_request
+        def stick_to_primary(response):
+            if not is_read_only() and app.config['SQLALCHEMY_BINDS'].get(REPLICA_BIND):
+                session['primary_until'] = time.time() + app.config['REPLICA_STICKY_SECONDS']
+            return response
+
+    def apply_driver_hacks(self, app, sa_url, options):
+        sa_url, options = super().apply_driver_hacks(app, sa_url, options)
+        if sa_url.drivername != 'sqlite':
+            # Pool settings from config.py; SQLite keeps Flask-SQLAlchemy's pools
+            options.update(
+                poolclass=TimedQueuePool,
+                pool_size=app.config['DB_POOL_SIZE'],
+                max_overflow=app.config['DB_MAX_OVERFLOW'],
+                pool_timeout=app.config['DB_POOL_TIMEOUT'],
+                pool_recycle=app.config['DB_POOL_RECYCLE'],
+                pool_pre_ping=app.config['DB_POOL_PRE_PING'],
+            )
+        if sa_url.drivername.startswith('postgresql') and app.config['DB_STATEMENT_TIMEOUT']:
+            connect_args = options.setdefault('connect_args', {})
+            connect_args['options'] = '-c statement_timeout={:d}'.format(app.config['DB_STATEMENT_TIMEOUT'])
+        return sa_url, options
+
+    def engines(self, app=None):
+        app = self.get_app(app)
+        return [self.get_engine(app, bind) for bind in [None] + list(app.config['SQLALCHEMY_BINDS'])]
+
+    def dispose_pools(self, app=None, close=True):
+        for engine in self.engines(app):
+            engine.dispose(close=close)
+
+    def fill_pools(self, app=None):
+        '''
+        Open DB_POOL_SIZE connections to every database up front, so the
+        first requests do not wait for them.
+        '''
+        app = self.get_app(app)
+        for engine in self.engines(app):
+            if isinstance(engine.pool, TimedQueuePool):
+                connections = [engine.connect() for _ in range(app.config['DB_POOL_SIZE'])]
+                for connection in connections:
+                    connection.close()
+
+    def pool_stats(self, app=None):
+        '''
+        Return checkout/wait statistics and the current pool status of the
+        primary and, if configured, replica engines.
+        '''
+        app = self.get_app(app)
+        stats = {}
+        for bind, engine in zip([None] + list(app.config['SQLALCHEMY_BINDS']), self.engines(app)):
+            pool = engine.pool
+            entry = {'status': pool.status()}
+            if isinstance(pool, TimedQueuePool):
+                entry.update(pool.stats.as_dict(), size=pool.size(),
+                             checked_out=pool.checkedout(), overflow=pool.overflow())
+            stats[bind or 'primary'] = entry
+        return stats
@@ -0,0 +1,197 @@
+import functools
+import time
+from datetime import datetime, timedelta, timezone
+from zoneinfo import ZoneInfo
+
+from flask import current_app
+
+#----------------------------------------------------------------------------#
+# Date formatting.
+#----------------------------------------------------------------------------#
+
+# The ``datetime`` template filter. Babel is imported on first use (see
+# app.py) and every (format, locale) pattern is parsed once. The formatted
+# strings are memoized too: the same show times come up again and again, on
+# /shows and on the pages of their venue and artist.
+#
+#   {{ show.start_time|datetime('full') }}
+#   {{ show.start_time|datetime('short', tz='Europe/Berlin') }}
+#
+# Values should be datetime objects; strings are still parsed, with
+# dateutil. Naive values are show times, in SHOW_TIMEZONE (see below), and
+# are shown as they are unless a time zone is asked for.
+
+# The app's own formats. Other names are babel's ('long', 'short'), anything
+# else a CLDR date pattern.
+FORMATS = {
+    'full': "EEEE MMMM, d, y 'at' h:mma",
+    'medium': "EE MM, dd, y h:mma",
+}
+
+
+@functools.lru_cache(maxsize=256)
+def compiled_pattern(format, locale):
+    '''
+    Return the parsed babel pattern for ``format`` and the babel Locale.
+    '''
+    from babel import Locale
+    from babel.dates import get_date_format, get_datetime_format, get_time_format, parse_pattern
+    locale = Locale.parse(locale)
+    pattern = FORMATS.get(format, format)
+    if pattern in ('full', 'long', 'medium', 'short'):
+        # One pattern out of the locale's date and time patterns, e.g.
+        # "{1} 'at' {0}"
+        pattern = get_datetime_format(pattern, locale).replace(
+            '{0}', get_time_format(pattern, locale).pattern).replace(
+            '{1}', get_date_format(pattern, locale).pattern)
+    return parse_pattern(pattern), locale
+
+
+@functools.lru_cache(maxsize=64)
+def time_zone(name):
+    from babel.dates import get_timezone
+    return get_timezone(name)
+
+
+def format_uncached(value, format, locale, tz=None, tzinfo=None, show_timezone=''):
+    # ``tzinfo``, the value's own, only tells memoized aware values apart
+    if isinstance(value, str):
+        import dateutil.parser
+        value = dateutil.parser.parse(value)
+    pattern, locale = compiled_pattern(format, locale)
+    if value.tzinfo is None and tz:
+        value = localize(value, show_timezone)
+    elif value.tzinfo is None:
+        # Shown as stored
+        value = value.replace(tzinfo=timezone.utc)
+    if tz:
+        value = value.astimezone(time_zone(tz))
+    return pattern.apply(value, locale)
+
+
+class DateTimeFormatter:
+    def __init__(self, locale='en_US', timezone='', show_timezone='', cache_size=0):
+        self.locale = locale
+        self.timezone = timezone
+        self.show_timezone = show_timezone
+        self.start(cache_size)
+
+    def start(self, cache_size):
+        self.cached = functools.lru_cache(maxsize=cache_size)(format_uncached) if cache_size else format_uncached
+
+    def __call__(self, value, format='medium', tz=None):
+        '''
+        Format ``value``, a datetime or a date string, with ``format`` in
+        the ``tz`` time zone, by default DATETIME_TIMEZONE.
+        '''
+        if value is None:
+            return ''
+        tz = tz or self.timezone
+        if isinstance(value, datetime):
+            # Aware datetimes compare (and hash) equal across time zones
+            return self.cached(value, format, self.locale, tz, value.tzinfo, self.show_timezone)
+        return self.cached(value, format, self.locale, tz, None, self.show_timezone)
+
+
+def init_datetime_format(app):
+    '''
+    Add the ``datetime`` filter to ``app``'s templates, formatting for
+    DATETIME_LOCALE and DATETIME_TIMEZONE and memoizing up to
+    DATETIME_CACHE_SIZE strings.
+    '''
+    format_datetime = app.extensions['datetime_format'] = DateTimeFormatter(
+        app.config['DATETIME_LOCALE'], app.config['DATETIME_TIMEZONE'],
+        app.config['SHOW_TIMEZONE'], app.config['DATETIME_CACHE_SIZE'])
+    app.jinja_env.filters['datetime'] = format_datetime
+
+#----------------------------------------------------------------------------#
+# Show times.
+#----------------------------------------------------------------------------#
+
+# Show.start_time is naive wall time in SHOW_TIMEZONE ('' for the server's
+# local time zone); updated_at and the other bookkeeping columns are naive
+# UTC. Whatever compares or converts show times goes through these.
+
+
+@functools.lru_cache(maxsize=16)
+def zone_info(name):
+    # None, which astimezone() and datetime.now() take as local time, for ''
+    return ZoneInfo(name) if name else None
+
+
+def localize(value, show_timezone):
+    '''
+    Return the naive show time ``value`` as an aware datetime.
+    '''
+    zone = zone_info(show_timezone)
+    return value.astimezone() if zone is None else value.replace(tzinfo=zone)
+
+
+def show_time_now():
+    '''
+    Return the current time as a naive show time.
+    '''
+    return datetime.now(zone_info(current_app.config['SHOW_TIMEZONE'])).replace(tzinfo=None)
+
+
+def to_show_time(value):
+    '''
+    Convert an aware datetime to a naive show time. Naive values are taken
+    to be show times already.
+    '''
+    if value.tzinfo is None:
+        return value
+    return value.astimezone(zone_info(current_app.config['SHOW_TIMEZONE'])).replace(tzinfo=None)
+
+
+def show_time_to_utc(value):
+    '''
+    Convert a naive show time to naive UTC, as updated_at is stored.
+    '''
+    return localize(value, current_app.config['SHOW_TIMEZONE']).astimezone(timezone.utc).replace(tzinfo=None)
+
+#----------------------------------------------------------------------------#
+# Micro-benchmark.
+#----------------------------------------------------------------------------#
+
+
+def reference_format_datetime(value, format='medium'):
+    # The filter as it was: the views passed str(start_time) and every call
+    # parsed it and had babel resolve the locale and pattern
+    import babel.dates
+    import dateutil.parser
+    date = dateutil.parser.parse(value)
+    if format == 'full':
+        format = "EEEE MMMM, d, y 'at' h:mma"
+    elif format == 'medium':
+        format = "EE MM, dd, y h:mma"
+    return babel.dates.format_datetime(date, format)
+
+
+def benchmark_datetime_format(shows=500, renders=20, format='full'):
+    '''
+    Format ``shows`` distinct show times ``renders`` times over, as that many
+    renders of a page listing them, with the reference implementation, the
+    compiled patterns alone and the memoizing filter. Returns microseconds
+    per formatted value for each.
+    '''
+    start = datetime(2030, 1, 1, 20, 0)
+    values = [start + timedelta(hours=7 * i) for i in range(shows)]
+    strings = [str(value) for value in values]
+    formatter = DateTimeFormatter(cache_size=shows)
+    candidates = (
+        ('reference', lambda: [reference_format_datetime(value, format) for value in strings]),
+        ('compiled', lambda: [format_uncached(value, format, formatter.locale) for value in values]),
+        ('memoized', lambda: [formatter(value, format) for value in values]),
+    )
+    expected = candidates[0][1]()
+    results = {}
+    for name, render in candidates:
+        # The first render loads babel's locale data and fills the caches
+        if render() != expected:
+            raise AssertionError('{} formats differently'.format(name))
+        started = time.perf_counter()
+        for i in range(renders):
+            render()
+        results[name] = round((time.perf_counter() - started) / (shows * renders) * 1e6, 3)
+    return results
@@ -0,0 +1,154 @@
+import threading
+import time
+from collections import OrderedDict
+
+from flask import current_app
+from sqlalchemy import event, orm
+from werkzeug.local import LocalProxy
+
+from models import Artist, Venue
+from database import RoutingSession
+
+#----------------------------------------------------------------------------#
+# Entity cache.
+#----------------------------------------------------------------------------#
+
+# Read-through, cross-request cache of Artist and Venue rows by id, as plain
+# dicts of their columns plus genre names. Rows changed through the ORM are
+# dropped when their transaction commits; changes made elsewhere (other
+# workers, bulk imports) show up after ENTITY_CACHE_TTL at the latest, or
+# right away for callers that pass the row's current updated_at, such as
+# the detail pages, whose ETags are built from it (see queries.py). The
+# show counters are left out: they change with every show, through bulk
+# UPDATEs the session does not track. updated_at is kept next to the
+# snapshot rather than in it. Each app has caches of its own, in
+# app.extensions; venue_cache and artist_cache are the current app's.
+
+UNCACHED_COLUMNS = {'upcoming_shows_count', 'past_shows_count', 'updated_at'}
+
+
+class EntityCache:
+    '''
+    LRU of up to ``maxsize`` snapshots of ``model`` rows, each kept for at
+    most ``ttl`` seconds.
+    '''
+
+    def __init__(self, model, maxsize=10000, ttl=60):
+        self.model = model
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+        self.columns = [column.name for column in model.__table__.columns
+                        if column.name not in UNCACHED_COLUMNS]
+        # Bumped by every invalidation, so a load that raced with a commit
+        # is not stored
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def snapshot(self, entity):
+        data = {name: getattr(entity, name) for name in self.columns}
+        data['genres'] = [genre.name for genre in entity.genres]
+        return data
+
+    def peek(self, entity_id, updated_at=None):
+        '''
+        Return a copy of the cached snapshot of the row with ``entity_id``,
+        or None on a miss, without loading it. With ``updated_at``, a
+        snapshot of another version of the row counts as a miss.
+        '''
+        now = time.monotonic()
+        with self.lock:
+            entry = self.entries.get(entity_id)
+            if entry is not None and entry[0] > now and updated_at in (None, entry[2]):
+                self.entries.move_to_end(entity_id)
+                self.hits += 1
+                return dict(entry[1])
+        return None
+
+    def get(self, entity_id, updated_at=None):
+        '''
+        As peek(), but loading the row on a miss. Returns None if there is
+        no such row.
+        '''
+        data = self.peek(entity_id, updated_at)
+        if data is not None:
+            return data
+        now = time.monotonic()
+        with self.lock:
+            self.misses += 1
+            generation = self.generation
+        entity = self.model.query.options(orm.selectinload(self.model.genres)).get(entity_id)
+        if entity is None:
+            return None
+        data = self.snapshot(entity)
+        with self.lock:
+            if generation == self.generation and self.maxsize > 0:
+                self.entries[entity_id] = (now + self.ttl, data, entity.updated_at)
+                self.entries.move_to_end(entity_id)
+                if len(self.entries) > self.maxsize:
+                    self.entries.popitem(last=False)
+                    self.evictions += 1
+        return dict(data)
+
+    def invalidate(self, entity_ids):
+        with self.lock:
+            self.generation += 1
+            for entity_id in entity_ids:
+                self.entries.pop(entity_id, None)
+
+    def clear(self):
+        with self.lock:
+            self.generation += 1
+            self.entries.clear()
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self.entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+MODELS = (Venue, Artist)
+
+venue_cache = LocalProxy(lambda: current_app.extensions['entity_cache'][Venue])
+artist_cache = LocalProxy(lambda: current_app.extensions['entity_cache'][Artist])
+
+
+def _collect_changes(session, flush_context, instances):
+    # Remember the cached entities each flush touches, until commit
+    changed = session.info.setdefault('entity_cache_changed', set())
+    for entity in list(session.dirty) + list(session.deleted):
+        if type(entity) in MODELS:
+            changed.add((type(entity), entity.id))
+
+
+def _invalidate_changes(session):
+    caches = session.app.extensions['entity_cache']
+    for model, entity_id in session.info.pop('entity_cache_changed', ()):
+        caches[model].invalidate([entity_id])
+
+
+def _forget_changes(session, previous_transaction):
+    session.info.pop('entity_cache_changed', None)
+
+
+def init_entity_cache(app):
+    '''
+    Create ``app``'s caches, sized from the config, and hook their
+    invalidation to the transactions of the app's sessions.
+    '''
+    app.extensions['entity_cache'] = {
+        model: EntityCache(model, app.config['ENTITY_CACHE_SIZE'], app.config['ENTITY_CACHE_TTL'])
+        for model in MODELS}
+    if not event.contains(RoutingSession, 'before_flush', _collect_changes):
+        event.listen(RoutingSession, 'before_flush', _collect_changes)
+        event.listen(RoutingSession, 'after_commit', _invalidate_changes)
+        event.listen(RoutingSession, 'after_soft_rollback', _forget_changes)
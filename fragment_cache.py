@@ -0,0 +1,290 @@
+import os
+import sqlite3
+import threading
+import weakref
+from collections import OrderedDict
+
+from flask import current_app
+from jinja2 import nodes
+from jinja2.ext import Extension
+from markupsafe import Markup
+from werkzeug.local import LocalProxy
+
+from conditional import markup_digest
+
+#----------------------------------------------------------------------------#
+# Fragment cache.
+#----------------------------------------------------------------------------#
+
+# Rendered listing tiles, keyed by the template, the entities a tile shows
+# and the current version of each of those entities:
+#
+#   {% cache 'show', show.id, 'artist', show.artist_id, 'venue', show.venue_id %}
+#
+# The edit and delete handlers bump an entity's version, which makes every
+# tile showing it miss; the stale tiles age out of the LRU. Keys also start
+# with the digest of the templates and static files (see conditional.py), so
+# tiles rendered by another deploy miss as well. Each app has a cache of its
+# own, in app.extensions; fragment_cache is the current app's.
+
+
+class LRUStore:
+    '''
+    Bounded in-process store of rendered (Markup) fragments: least recently used fragments are evicted
+    beyond ``maxsize``. Entity versions are kept apart and never evicted.
+    '''
+
+    def __init__(self, maxsize=10000):
+        self.maxsize = maxsize
+        self.lock = threading.Lock()
+        self.fragments = OrderedDict()
+        self.versions = {}
+
+    def get(self, key):
+        with self.lock:
+            value = self.fragments.get(key)
+            if value is not None:
+                self.fragments.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self.lock:
+            self.fragments[key] = value
+            self.fragments.move_to_end(key)
+            if len(self.fragments) > self.maxsize:
+                self.fragments.popitem(last=False)
+
+    def sync(self):
+        pass
+
+    def version(self, entity):
+        return self.versions.get(entity, 0)
+
+    def bump(self, entity):
+        with self.lock:
+            self.versions[entity] = self.versions.get(entity, 0) + 1
+
+    def clear(self):
+        with self.lock:
+            self.fragments.clear()
+
+
+# Live SQLiteStores; SQLite connections must not be used across a fork
+sqlite_stores = weakref.WeakSet()
+
+
+def _reset_stores_in_child():
+    for store in list(sqlite_stores):
+        store.reset()
+
+
+os.register_at_fork(after_in_child=_reset_stores_in_child)
+
+
+class SQLiteStore:
+    '''
+    Store in a local SQLite file, shared by the worker processes of one
+    host so an edit in one worker invalidates the tiles of all of them.
+    Beyond ``maxsize`` the oldest fragments are pruned.
+
+    A fragment never changes under its key, so every process also keeps
+    the fragments it has read in an LRUStore. Versions are cached per
+    connection, and dropped by sync() when SQLite's data_version says
+    another connection wrote.
+    '''
+
+    # Prune once every this many writes
+    PRUNE_EVERY = 100
+
+    def __init__(self, path, maxsize=10000):
+        self.path = path
+        self.maxsize = maxsize
+        self.memory = LRUStore(maxsize)
+        self.local = threading.local()
+        self.writes = 0
+        sqlite_stores.add(self)
+        with self.connection() as connection:
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('CREATE TABLE IF NOT EXISTS fragment '
+                               '(key TEXT PRIMARY KEY, value TEXT NOT NULL)')
+            connection.execute('CREATE TABLE IF NOT EXISTS version '
+                               '(entity TEXT PRIMARY KEY, version INTEGER NOT NULL)')
+
+    def reset(self):
+        self.local = threading.local()
+
+    def connection(self):
+        local = self.local
+        if getattr(local, 'connection', None) is None:
+            local.connection = sqlite3.connect(self.path, timeout=5)
+            local.connection.execute('PRAGMA synchronous=OFF')
+            local.versions = {}
+            local.data_version = None
+        return local.connection
+
+    def get(self, key):
+        value = self.memory.get(key)
+        if value is None:
+            row = self.connection().execute(
+                'SELECT value FROM fragment WHERE key = ?', (key,)).fetchone()
+            if row:
+                value = Markup(row[0])
+                self.memory.set(key, value)
+        return value
+
+    def set(self, key, value):
+        self.memory.set(key, value)
+        with self.connection() as connection:
+            connection.execute('INSERT OR REPLACE INTO fragment (key, value) VALUES (?, ?)', (key, str(value)))
+            self.writes += 1
+            if self.writes % self.PRUNE_EVERY == 0:
+                # Rowids grow with every insert, so the lowest are the oldest
+                connection.execute(
+                    'DELETE FROM fragment WHERE rowid <= '
+                    '(SELECT MAX(rowid) FROM fragment) - ?', (self.maxsize,))
+
+    def sync(self):
+        data_version = self.connection().execute('PRAGMA data_version').fetchone()[0]
+        if data_version != self.local.data_version:
+            self.local.versions.clear()
+            self.local.data_version = data_version
+
+    def version(self, entity):
+        connection = self.connection()
+        local = self.local
+        version = local.versions.get(entity)
+        if version is None:
+            row = connection.execute(
+                'SELECT version FROM version WHERE entity = ?', (entity,)).fetchone()
+            version = local.versions[entity] = row[0] if row else 0
+        return version
+
+    def bump(self, entity):
+        with self.connection() as connection:
+            connection.execute(
+                'INSERT INTO version (entity, version) VALUES (?, 1) '
+                'ON CONFLICT (entity) DO UPDATE SET version = version + 1', (entity,))
+        # data_version does not change for this connection's own writes
+        self.local.versions.pop(entity, None)
+
+    def clear(self):
+        self.memory.clear()
+        with self.connection() as connection:
+            connection.execute('DELETE FROM fragment')
+
+
+class FragmentCache:
+    def __init__(self, store=None, digest=''):
+        self.store = store
+        self.digest = digest
+
+    def key(self, template, parts):
+        # parts are (entity, id) pairs
+        if self.store is None:
+            return None
+        version = self.store.version
+        key = '%s:%s' % (self.digest, template)
+        for index in range(0, len(parts), 2):
+            name = '%s:%s' % (parts[index], parts[index + 1])
+            key += '|%s@%d' % (name, version(name))
+        return key
+
+    def sync(self):
+        '''
+        Pick up the invalidations of other processes; called before every
+        request.
+        '''
+        if self.store is not None:
+            self.store.sync()
+
+    def get(self, key):
+        if key is None:
+            return None
+        return self.store.get(key)
+
+    def set(self, key, value):
+        # The key the fragment was looked up with: versions read again now
+        # could already be bumped past what the fragment shows
+        if key is not None:
+            self.store.set(key, value)
+
+    def invalidate(self, entity, entity_id):
+        '''
+        Make every cached tile that shows this entity miss.
+        '''
+        if self.store is not None:
+            self.store.bump('{}:{}'.format(entity, entity_id))
+
+
+class FragmentCacheExtension(Extension):
+    '''
+    {% cache entity, id[, entity, id...] %}...{% endcache %}
+
+    Compiles to a key, a lookup and, on a miss only, a {% set %} block
+    capturing the body, stored under that same key. These are filters, the
+    methods of the environment's FragmentCache, which templates call
+    directly rather than through Context.call, so a hit costs little more
+    than the dict lookups.
+    '''
+    tags = {'cache'}
+
+    def __init__(self, environment):
+        super().__init__(environment)
+        # Storeless, rendering every tile, until an app's cache is bound
+        bind_fragment_cache(environment, FragmentCache())
+
+    def parse(self, parser):
+        lineno = next(parser.stream).lineno
+        parts = [parser.parse_expression()]
+        while parser.stream.skip_if('comma'):
+            parts.append(parser.parse_expression())
+        body = parser.parse_statements(('name:endcache',), drop_needle=True)
+        key = 'fragment_cache_key_{}'.format(lineno)
+        value = 'fragment_cache_{}'.format(lineno)
+
+        def call(name, node, *args):
+            return nodes.Filter(node, name, list(args), [], None, None)
+        return [
+            nodes.Assign(nodes.Name(key, 'store'), call(
+                'fragment_cache_key', nodes.Const(parser.name), nodes.List(parts))),
+            nodes.Assign(nodes.Name(value, 'store'), call('fragment_cache_get', nodes.Name(key, 'load'))),
+            nodes.If(nodes.Test(nodes.Name(value, 'load'), 'none', [], [], None, None), [
+                nodes.AssignBlock(nodes.Name(value, 'store'), None, body),
+                nodes.ExprStmt(call('fragment_cache_set', nodes.Name(key, 'load'), nodes.Name(value, 'load'))),
+            ], [], []),
+            nodes.Output([nodes.Name(value, 'load')]),
+        ]
+
+
+def bind_fragment_cache(environment, cache):
+    environment.filters['fragment_cache_key'] = cache.key
+    environment.filters['fragment_cache_get'] = cache.get
+    environment.filters['fragment_cache_set'] = cache.set
+
+
+fragment_cache = LocalProxy(lambda: current_app.extensions['fragment_cache'])
+
+
+def init_fragment_cache(app):
+    '''
+    Enable {% cache %} in ``app``'s templates, backed by FRAGMENT_CACHE_PATH
+    if set and an in-process LRU otherwise. A FRAGMENT_CACHE_SIZE of 0
+    renders every tile.
+    '''
+    size = app.config['FRAGMENT_CACHE_SIZE']
+    if size <= 0:
+        store = None
+    elif app.config['FRAGMENT_CACHE_PATH']:
+        store = SQLiteStore(app.config['FRAGMENT_CACHE_PATH'], size)
+    else:
+        store = LRUStore(size)
+    cache = app.extensions['fragment_cache'] = FragmentCache(store, markup_digest(app))
+    app.jinja_env.add_extension(FragmentCacheExtension)
+    bind_fragment_cache(app.jinja_env, cache)
+    app.before_request(cache.sync)
+
+    @app.before_request
+    def reload_markup_digest():
+        # Tiles of edited templates miss
+        if app.templates_auto_reload:
+            cache.digest = markup_digest(app)
@@ -0,0 +1,96 @@
+import gc
+import multiprocessing
+import os
+import resource
+import tempfile
+
+#----------------------------------------------------------------------------#
+# Production server.
+#----------------------------------------------------------------------------#
+
+#   gunicorn -c gunicorn.conf.py 'app:create_app()'
+#
+# The master imports the app once and warms it up (warmup.py), then forks
+# the workers, which share the imported modules, compiled templates and
+# caches copy-on-write. Each worker drops the inherited database pools
+# (database.py) and opens its own connections before it accepts requests.
+#
+# Signals to the master:
+#   HUP         replace every worker, gracefully; the preloaded code stays
+#   USR2, then  start a new master on the new code next to the old one, then
+#   QUIT (old)  stop the old master once its workers finished: a code deploy
+#               without dropped requests
+#   TTIN/TTOU   one worker more/less
+#
+# Workers are recycled after WORKER_MAX_REQUESTS requests (with jitter, so
+# they do not all restart together) and once the memory they do not share
+# with the master passes WORKER_MAX_RSS_MB, to cap memory growth. Their RSS
+# would also count the preloaded pages, which recycling does not free.
+
+os.environ.setdefault('DEBUG', '0')
+# Edits in one worker must invalidate the cached tiles of all of them
+os.environ.setdefault('FRAGMENT_CACHE_PATH', os.path.join(tempfile.gettempdir(), 'fyyur-fragments.db'))
+
+bind = '0.0.0.0:' + os.environ.get('PORT', '5000')
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1))
+# Threads per worker, which wait on the database without holding the GIL
+worker_class = 'gthread'
+threads = int(os.environ.get('WEB_THREADS', 4))
+preload_app = True
+timeout = 30
+graceful_timeout = 30
+keepalive = 5
+
+max_requests = int(os.environ.get('WORKER_MAX_REQUESTS', 1000))
+max_requests_jitter = max_requests // 10
+max_rss_mb = int(os.environ.get('WORKER_MAX_RSS_MB', 512))
+# Reading /proc/self/smaps_rollup takes about half a millisecond
+memory_check_interval = 16
+
+
+def when_ready(server):
+    # Runs in the master, after the app is loaded and before any worker
+    from warmup import warm_up
+    warm_up(server.app.wsgi())
+    # Keep what the workers inherit out of their garbage collections,
+    # which would otherwise touch, and so copy, every shared page
+    gc.freeze()
+    server.log.info('Warmed up')
+
+
+def peak_rss_mb():
+    # ru_maxrss is in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss // 1024
+
+
+def private_memory_mb():
+    # Pages only this process maps: those it allocated, or copied from the
+    # master by writing to them. None where the kernel does not tell.
+    try:
+        with open('/proc/self/smaps_rollup') as smaps:
+            return sum(int(line.split()[1]) for line in smaps if line.startswith('Private_')) // 1024
+    except OSError:
+        return None
+
+
+def post_fork(server, worker):
+    worker.forked_rss_mb = peak_rss_mb()
+
+
+def post_worker_init(worker):
+    from models import db
+    app = worker.wsgi
+    with app.app_context():
+        db.fill_pools(app)
+
+
+def post_request(worker, req, environ, resp):
+    if not max_rss_mb or worker.nr % memory_check_interval:
+        return
+    used_mb = private_memory_mb()
+    if used_mb is None:
+        # Growth of the peak RSS since the fork instead
+        used_mb = peak_rss_mb() - worker.forked_rss_mb
+    if used_mb > max_rss_mb and worker.alive:
+        worker.log.info('Worker %s uses %d MB of its own, recycling it', worker.pid, used_mb)
+        worker.alive = False
@@ -0,0 +1,257 @@
+import atexit
+import json
+import logging
+import os
+import random
+import threading
+import traceback
+from datetime import datetime
+from logging.handlers import QueueHandler, RotatingFileHandler
+from queue import Queue, Empty, Full
+
+from flask.logging import default_handler
+
+#----------------------------------------------------------------------------#
+# Logging pipeline.
+#----------------------------------------------------------------------------#
+
+# Request handlers only put records on a bounded queue; a background thread
+# writes them to rotating files in batches, flushing once per batch instead
+# of once per record. When the queue is full records are dropped and
+# counted rather than blocking the request. Forked workers write files of
+# their own, see LogPipeline.
+
+# Logger of the per-request SQL profile records, see sql_profiler.py
+SQL_PROFILE_LOGGER = 'fyyur.sql_profile'
+
+# LogRecord attributes that are not structured fields passed with extra=
+RECORD_ATTRIBUTES = set(vars(logging.makeLogRecord({}))) | {'message', 'asctime'}
+
+
+class JSONFormatter(logging.Formatter):
+    '''
+    One JSON object per record: time, level, logger, message, any extra=
+    fields and the formatted exception.
+    '''
+
+    def format(self, record):
+        entry = {
+            'time': datetime.utcfromtimestamp(record.created).isoformat(timespec='milliseconds') + 'Z',
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in RECORD_ATTRIBUTES:
+                entry[key] = value
+        if record.exc_text:
+            entry['exception'] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    '''
+    Keep only a share of the records of each level, {level name: rate};
+    levels without a rate are all kept.
+    '''
+
+    def __init__(self, rates):
+        super().__init__()
+        self.rates = {logging.getLevelName(level): rate for level, rate in rates.items()}
+
+    def filter(self, record):
+        rate = self.rates.get(record.levelno, 1.0)
+        return rate >= 1.0 or random.random() < rate
+
+
+class DroppingQueueHandler(QueueHandler):
+    def __init__(self, queue):
+        super().__init__(queue)
+        self.dropped = 0
+
+    def prepare(self, record):
+        # Resolve the message and traceback in the calling thread, as the
+        # arguments may change after the request, but leave the formatting
+        # to the writer thread
+        record = logging.makeLogRecord(vars(record))
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = ''.join(traceback.format_exception(*record.exc_info)).rstrip()
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except Full:
+            self.dropped += 1
+
+
+class BatchedRotatingFileHandler(RotatingFileHandler):
+    '''
+    RotatingFileHandler that leaves the flushing of its buffered writes to
+    flush_batch().
+    '''
+
+    def flush(self):
+        pass
+
+    def flush_batch(self):
+        super().flush()
+
+
+class LogWriter(threading.Thread):
+    '''
+    Background thread that takes up to ``batch_size`` records at a time off
+    ``queue``, hands them to ``handlers`` and flushes those once per batch,
+    or after ``flush_interval`` seconds at the latest.
+    '''
+
+    def __init__(self, queue, handlers, batch_size=100, flush_interval=1.0):
+        super().__init__(name='log-writer', daemon=True)
+        self.queue = queue
+        self.handlers = handlers
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.stopped = threading.Event()
+        # Held while a batch is written out, see LogPipeline.before_fork()
+        self.lock = threading.Lock()
+
+    def run(self):
+        while not (self.stopped.is_set() and self.queue.empty()):
+            try:
+                batch = [self.queue.get(timeout=self.flush_interval)]
+            except Empty:
+                continue
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except Empty:
+                    break
+            with self.lock:
+                for record in batch:
+                    for handler in self.handlers:
+                        if record.levelno >= handler.level:
+                            handler.handle(record)
+                for handler in self.handlers:
+                    handler.flush_batch()
+
+    def stop(self):
+        self.stopped.set()
+        self.join()
+        for handler in self.handlers:
+            handler.close()
+
+
+def process_path(path):
+    # error.log -> error.<pid>.log
+    root, extension = os.path.splitext(path)
+    return '{}.{}{}'.format(root, os.getpid(), extension)
+
+
+class LogPipeline:
+    '''
+    The queue handler, rotating files and writer thread behind the loggers
+    set up by init_logging().
+
+    Rotating a file is not safe with several processes writing it, so a
+    forked worker writes files of its own, named after its pid, e.g.
+    error.1234.log; the process that called init_logging() keeps LOG_FILE
+    and SQL_PROFILE_LOG.
+    '''
+
+    def __init__(self):
+        self.config = None
+        self.loggers = []
+        self.queue_handler = None
+        self.writer = None
+
+    def start(self, config, loggers):
+        self.stop()
+        self.config = config
+        self.loggers = loggers
+        self.queue_handler = DroppingQueueHandler(Queue(config['LOG_QUEUE_SIZE']))
+        self.queue_handler.addFilter(SamplingFilter(config['LOG_SAMPLE_RATES']))
+        self.start_writer(config['LOG_FILE'], config['SQL_PROFILE_LOG'])
+        for logger in loggers:
+            logger.addHandler(self.queue_handler)
+
+    def start_writer(self, log_path, profile_path):
+        config = self.config
+        log_file = BatchedRotatingFileHandler(
+            log_path, maxBytes=config['LOG_MAX_BYTES'], backupCount=config['LOG_BACKUP_COUNT'])
+        log_file.setFormatter(JSONFormatter())
+        log_file.addFilter(lambda record: record.name != SQL_PROFILE_LOGGER)
+        profile_file = BatchedRotatingFileHandler(
+            profile_path, maxBytes=config['LOG_MAX_BYTES'], backupCount=config['LOG_BACKUP_COUNT'])
+        profile_file.setFormatter(logging.Formatter('%(message)s'))
+        profile_file.addFilter(logging.Filter(SQL_PROFILE_LOGGER))
+        self.writer = LogWriter(self.queue_handler.queue, [log_file, profile_file],
+                                config['LOG_BATCH_SIZE'], config['LOG_FLUSH_INTERVAL'])
+        self.writer.start()
+
+    def stop(self):
+        if self.writer is None:
+            return
+        for logger in self.loggers:
+            logger.removeHandler(self.queue_handler)
+        self.writer.stop()
+        self.writer = None
+
+    def before_fork(self):
+        # No batch half written: the child's copies of the file buffers
+        # are empty, and closing them writes nothing
+        if self.writer is not None:
+            self.writer.lock.acquire()
+
+    def after_fork_in_parent(self):
+        if self.writer is not None:
+            self.writer.lock.release()
+
+    def after_fork_in_child(self):
+        # The child inherits the queue and the open files, but not the
+        # writer thread
+        if self.writer is None:
+            return
+        for handler in self.writer.handlers:
+            handler.close()
+        self.queue_handler.queue = Queue(self.config['LOG_QUEUE_SIZE'])
+        self.start_writer(process_path(self.config['LOG_FILE']), process_path(self.config['SQL_PROFILE_LOG']))
+
+
+log_pipeline = LogPipeline()
+os.register_at_fork(before=log_pipeline.before_fork,
+                    after_in_parent=log_pipeline.after_fork_in_parent,
+                    after_in_child=log_pipeline.after_fork_in_child)
+atexit.register(log_pipeline.stop)
+
+
+def init_logging(app):
+    '''
+    Send the records of ``app.logger`` and the SQL profile logger through
+    the queue to their rotating files: LOG_FILE, as JSON, and
+    SQL_PROFILE_LOG, one profile per line. Replaces the pipeline of an
+    earlier call. Returns the writer thread.
+    '''
+    # Payload dumps are logged at DEBUG, so they stay out of production
+    app.logger.setLevel(logging.DEBUG if app.debug else logging.INFO)
+    if not app.debug:
+        # Flask's synchronous stderr handler
+        app.logger.removeHandler(default_handler)
+    profile_logger = logging.getLogger(SQL_PROFILE_LOGGER)
+    profile_logger.setLevel(logging.INFO)
+    profile_logger.propagate = False
+    log_pipeline.start(app.config, [app.logger, profile_logger])
+    return log_pipeline.writer
+
+
+def log_payload(logger, message, payload):
+    '''
+    Log a request payload (e.g. a form) at DEBUG, without building the
+    record at all when DEBUG is off.
+    '''
+    if logger.isEnabledFor(logging.DEBUG):
+        if hasattr(payload, 'to_dict'):
+            payload = payload.to_dict(flat=False)
+        logger.debug(message, stacklevel=2, extra={'payload': payload})
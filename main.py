@@ -0,0 +1,79 @@
+from flask import Blueprint, Response, abort, jsonify, render_template, request, stream_with_context
+
+from models import db
+from search_index import venue_index, artist_index, refresh_search_indexes
+from bulk_export import EXPORT_KINDS, EXPORT_FORMATS, export_chunks, encode_chunks
+from entity_cache import venue_cache, artist_cache
+
+#----------------------------------------------------------------------------#
+# Home, search, export and metrics.
+#----------------------------------------------------------------------------#
+
+bp = Blueprint('main', __name__)
+
+
+@bp.route('/')
+def index():
+    return render_template('pages/home.html')
+
+
+#  Autocomplete
+#  ----------------------------------------------------------------
+
+
+@bp.route('/search/autocomplete')
+def autocomplete():
+    # As-you-type suggestions served from the in-memory indexes, once they
+    # caught up with writes of other workers
+    query = request.args.get('q', '')
+    limit = max(1, min(request.args.get('limit', 10, type=int), 50))
+    refresh_search_indexes()
+    return jsonify({
+        "venues": [{"id": venue_id, "name": name}
+                   for venue_id, name in venue_index.lookup(query, limit)],
+        "artists": [{"id": artist_id, "name": name}
+                    for artist_id, name in artist_index.lookup(query, limit)]
+    })
+
+#  Export
+#  ----------------------------------------------------------------
+
+
+@bp.route('/export/<kind>')
+def export(kind):
+    # Streams the whole table; ?format=jsonl|csv, ?gzip=1 to compress
+    format = request.args.get('format', 'jsonl')
+    if kind not in EXPORT_KINDS or format not in EXPORT_FORMATS:
+        abort(404)
+    compress = request.args.get('gzip') == '1'
+    filename = '{}.{}{}'.format(kind, format, '.gz' if compress else '')
+    body = encode_chunks(export_chunks(kind, format), compress)
+    return Response(
+        stream_with_context(body),
+        mimetype='application/gzip' if compress else (
+            'text/csv' if format == 'csv' else 'application/x-ndjson'),
+        headers={'Content-Disposition': 'attachment; filename=' + filename}
+    )
+
+#  Metrics
+#  ----------------------------------------------------------------
+
+
+@bp.route('/metrics/pool')
+def pool_metrics():
+    # Connection pool checkout/wait statistics, for sizing the pools
+    return jsonify(db.pool_stats())
+
+
+@bp.route('/metrics/entity-cache')
+def entity_cache_metrics():
+    return jsonify(venues=venue_cache.stats(), artists=artist_cache.stats())
+
+@bp.app_errorhandler(404)
+def not_found_error(error):
+    return render_template('errors/404.html'), 404
+
+
+@bp.app_errorhandler(500)
+def server_error(error):
+    return render_template('errors/500.html'), 500
@@ -0,0 +1,38 @@
+"""add table versions
+
+Revision ID: 2c9d41e7b3a5
+Revises: 7b2e4f9a1c36
+Create Date: 2026-10-19 09:14:52.206731
+
+"""
+from datetime import datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '2c9d41e7b3a5'
+down_revision = '7b2e4f9a1c36'
+branch_labels = None
+depends_on = None
+
+TABLES = ('Venue', 'Artist', 'Show')
+
+
+def upgrade():
+    versions = op.create_table('TableVersion',
+    sa.Column('name', sa.String(length=64), nullable=False),
+    sa.Column('version', sa.Integer(), nullable=False),
+    sa.Column('deletions', sa.Integer(), nullable=False),
+    sa.Column('changed_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('name')
+    )
+    now = datetime.utcnow()
+    op.bulk_insert(versions, [
+        {'name': table, 'version': 1, 'deletions': 0, 'changed_at': now} for table in TABLES
+    ])
+
+
+def downgrade():
+    op.drop_table('TableVersion')
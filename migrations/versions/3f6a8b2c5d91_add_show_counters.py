@@ -0,0 +1,57 @@
+"""add show counters
+
+Revision ID: 3f6a8b2c5d91
+Revises: 9d2c4e7a1b38
+Create Date: 2026-10-18 11:02:17.504316
+
+"""
+from datetime import datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f6a8b2c5d91'
+down_revision = '9d2c4e7a1b38'
+branch_labels = None
+depends_on = None
+
+COUNTED = (('Artist', 'artist_id'), ('Venue', 'venue_id'))
+
+
+def upgrade():
+    for table, _ in COUNTED:
+        op.add_column(table, sa.Column('upcoming_shows_count', sa.Integer(), nullable=False, server_default='0'))
+        op.add_column(table, sa.Column('past_shows_count', sa.Integer(), nullable=False, server_default='0'))
+    rollover = op.create_table('ShowRollover',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('rolled_over_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+
+    # Backfill the counters against the initial watermark
+    now = datetime.now()
+    op.bulk_insert(rollover, [{'id': 1, 'rolled_over_at': now}])
+    show = sa.table('Show', sa.column('start_time', sa.DateTime()),
+                    sa.column('artist_id', sa.Integer()), sa.column('venue_id', sa.Integer()))
+    for table, fk in COUNTED:
+        entity = sa.table(table, sa.column('id', sa.Integer()),
+                          sa.column('upcoming_shows_count', sa.Integer()),
+                          sa.column('past_shows_count', sa.Integer()))
+
+        def count(*criteria):
+            return sa.select(sa.func.count()).select_from(show).where(
+                show.c[fk] == entity.c.id, *criteria).scalar_subquery()
+
+        op.execute(entity.update().values(
+            upcoming_shows_count=count(show.c.start_time > now),
+            past_shows_count=count(show.c.start_time <= now)
+        ))
+
+
+def downgrade():
+    op.drop_table('ShowRollover')
+    for table, _ in COUNTED:
+        op.drop_column(table, 'past_shows_count')
+        op.drop_column(table, 'upcoming_shows_count')
@@ -0,0 +1,47 @@
+"""narrow search update triggers
+
+Revision ID: 5a0d7c3e9f14
+Revises: e81b5f3a2c07
+Create Date: 2026-10-18 13:20:44.615902
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '5a0d7c3e9f14'
+down_revision = 'e81b5f3a2c07'
+branch_labels = None
+depends_on = None
+
+SEARCH_TABLES = ('Venue', 'Artist')
+SEARCH_COLUMNS = ('name', 'city', 'state')
+
+
+def _create_update_trigger(table, of_columns):
+    # Re-index the FTS row on update; with of_columns only when one of the
+    # searched columns changes, not on every counter update
+    fts = table + '_search'
+    columns = ', '.join(SEARCH_COLUMNS)
+    op.execute('DROP TRIGGER IF EXISTS "{}_au"'.format(fts))
+    op.execute(
+        'CREATE TRIGGER "{fts}_au" AFTER UPDATE {of}ON "{table}" BEGIN '
+        'INSERT INTO "{fts}"("{fts}", rowid, {columns}) VALUES (\'delete\', old.id, {old}); '
+        'INSERT INTO "{fts}"(rowid, {columns}) VALUES (new.id, {new}); '
+        'END'.format(
+            fts=fts, table=table, columns=columns,
+            of='OF {} '.format(columns) if of_columns else '',
+            old=', '.join('old.' + column for column in SEARCH_COLUMNS),
+            new=', '.join('new.' + column for column in SEARCH_COLUMNS)))
+
+
+def upgrade():
+    if op.get_bind().dialect.name == 'sqlite':
+        for table in SEARCH_TABLES:
+            _create_update_trigger(table, of_columns=True)
+
+
+def downgrade():
+    if op.get_bind().dialect.name == 'sqlite':
+        for table in SEARCH_TABLES:
+            _create_update_trigger(table, of_columns=False)
@@ -0,0 +1,42 @@
+"""add updated_at
+
+Revision ID: 7b2e4f9a1c36
+Revises: 5a0d7c3e9f14
+Create Date: 2026-10-18 20:04:12.381920
+
+"""
+from datetime import datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7b2e4f9a1c36'
+down_revision = '5a0d7c3e9f14'
+branch_labels = None
+depends_on = None
+
+TABLES = ('Venue', 'Artist', 'Show')
+
+
+def upgrade():
+    connection = op.get_bind()
+    now = datetime.utcnow()
+    for table in TABLES:
+        # Added nullable and backfilled: SQLite cannot add a NOT NULL column
+        # with a non-constant default, and a batch rebuild would drop the
+        # search triggers
+        op.add_column(table, sa.Column('updated_at', sa.DateTime(), nullable=True))
+        op.execute(sa.table(table, sa.column('updated_at', sa.DateTime())).update().values(updated_at=now))
+        if connection.dialect.name != 'sqlite':
+            # Rows written by COPY (bulk_import.py) get the database's time
+            op.alter_column(table, 'updated_at', existing_type=sa.DateTime(), nullable=False,
+                            server_default=sa.text("(now() at time zone 'utc')"))
+        op.create_index('ix_{}_updated_at'.format(table), table, ['updated_at'], unique=False)
+
+
+def downgrade():
+    for table in TABLES:
+        op.drop_index('ix_{}_updated_at'.format(table), table_name=table)
+        op.drop_column(table, 'updated_at')
@@ -0,0 +1,71 @@
+"""add search indexes
+
+Revision ID: 9d2c4e7a1b38
+Revises: 5cb73eb70b32
+Create Date: 2026-10-18 10:12:41.338120
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '9d2c4e7a1b38'
+down_revision = '5cb73eb70b32'
+branch_labels = None
+depends_on = None
+
+SEARCH_TABLES = ('Venue', 'Artist')
+SEARCH_COLUMNS = ('name', 'city', 'state')
+
+
+def upgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == 'postgresql':
+        # Trigram GIN indexes answer ILIKE '%term%' without a sequential scan
+        op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+        for table in SEARCH_TABLES:
+            for column in SEARCH_COLUMNS:
+                op.create_index(
+                    'ix_{}_{}_trgm'.format(table, column), table, [column],
+                    postgresql_using='gin',
+                    postgresql_ops={column: 'gin_trgm_ops'}
+                )
+    elif dialect == 'sqlite':
+        # External-content FTS5 trigram tables mirroring the searched columns
+        columns = ', '.join(SEARCH_COLUMNS)
+        new_values = ', '.join('new.' + column for column in SEARCH_COLUMNS)
+        old_values = ', '.join('old.' + column for column in SEARCH_COLUMNS)
+        for table in SEARCH_TABLES:
+            fts = table + '_search'
+            op.execute(
+                "CREATE VIRTUAL TABLE \"{fts}\" USING fts5({columns}, "
+                "content='{table}', content_rowid='id', tokenize='trigram')".format(
+                    fts=fts, table=table, columns=columns))
+            op.execute(
+                'CREATE TRIGGER "{fts}_ai" AFTER INSERT ON "{table}" BEGIN '
+                'INSERT INTO "{fts}"(rowid, {columns}) VALUES (new.id, {new}); '
+                'END'.format(fts=fts, table=table, columns=columns, new=new_values))
+            op.execute(
+                'CREATE TRIGGER "{fts}_ad" AFTER DELETE ON "{table}" BEGIN '
+                'INSERT INTO "{fts}"("{fts}", rowid, {columns}) VALUES (\'delete\', old.id, {old}); '
+                'END'.format(fts=fts, table=table, columns=columns, old=old_values))
+            op.execute(
+                'CREATE TRIGGER "{fts}_au" AFTER UPDATE ON "{table}" BEGIN '
+                'INSERT INTO "{fts}"("{fts}", rowid, {columns}) VALUES (\'delete\', old.id, {old}); '
+                'INSERT INTO "{fts}"(rowid, {columns}) VALUES (new.id, {new}); '
+                'END'.format(fts=fts, table=table, columns=columns, old=old_values, new=new_values))
+            op.execute('INSERT INTO "{0}"("{0}") VALUES (\'rebuild\')'.format(fts))
+
+
+def downgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == 'postgresql':
+        for table in SEARCH_TABLES:
+            for column in SEARCH_COLUMNS:
+                op.drop_index('ix_{}_{}_trgm'.format(table, column), table_name=table)
+    elif dialect == 'sqlite':
+        for table in SEARCH_TABLES:
+            fts = table + '_search'
+            for suffix in ('ai', 'ad', 'au'):
+                op.execute('DROP TRIGGER IF EXISTS "{}_{}"'.format(fts, suffix))
+            op.execute('DROP TABLE IF EXISTS "{}"'.format(fts))
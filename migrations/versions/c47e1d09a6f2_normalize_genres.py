@@ -0,0 +1,92 @@
+"""normalize genres
+
+Revision ID: c47e1d09a6f2
+Revises: 3f6a8b2c5d91
+Create Date: 2026-10-18 11:47:52.190844
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c47e1d09a6f2'
+down_revision = '3f6a8b2c5d91'
+branch_labels = None
+depends_on = None
+
+# The choices previously hardcoded in forms.py, in their original order
+DEFAULT_GENRES = (
+    'Alternative', 'Blues', 'Classical', 'Country', 'Electronic', 'Folk',
+    'Funk', 'Hip-Hop', 'Heavy Metal', 'Instrumental', 'Jazz',
+    'Musical Theatre', 'Pop', 'Punk', 'R&B', 'Reggae', 'Rock n Roll', 'Soul',
+    'Other',
+)
+
+# (entity table, association table, association column, old column length)
+ASSOCIATIONS = (
+    ('Venue', 'VenueGenre', 'venue_id', None),
+    ('Artist', 'ArtistGenre', 'artist_id', 120),
+)
+
+
+def upgrade():
+    genre = op.create_table('Genre',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(length=120), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('name')
+    )
+    for table, association, column, _ in ASSOCIATIONS:
+        op.create_table(association,
+        sa.Column(column, sa.Integer(), nullable=False),
+        sa.Column('genre_id', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint([column], [table + '.id'], ),
+        sa.ForeignKeyConstraint(['genre_id'], ['Genre.id'], ),
+        sa.PrimaryKeyConstraint(column, 'genre_id')
+        )
+        op.create_index('ix_{}_genre_id_{}'.format(association, column), association, ['genre_id', column])
+
+    # Data migration from the ';'-joined strings
+    connection = op.get_bind()
+    genre_ids = {}
+
+    def genre_id(name):
+        if name not in genre_ids:
+            genre_ids[name] = connection.execute(
+                genre.insert().values(name=name)).inserted_primary_key[0]
+        return genre_ids[name]
+
+    for name in DEFAULT_GENRES:
+        genre_id(name)
+    for table, association, column, _ in ASSOCIATIONS:
+        entity = sa.table(table, sa.column('id', sa.Integer()), sa.column('genres', sa.String()))
+        links = sa.table(association, sa.column(column, sa.Integer()), sa.column('genre_id', sa.Integer()))
+        rows = []
+        for entity_id, genres in connection.execute(sa.select(entity.c.id, entity.c.genres)):
+            names = {name.strip() for name in (genres or '').split(';') if name.strip()}
+            rows.extend({column: entity_id, 'genre_id': genre_id(name)} for name in sorted(names))
+        if rows:
+            op.bulk_insert(links, rows)
+        # Plain ALTER TABLE (SQLite 3.35+): a batch table rebuild would drop
+        # the search triggers on SQLite
+        op.drop_column(table, 'genres')
+
+
+def downgrade():
+    connection = op.get_bind()
+    genre = sa.table('Genre', sa.column('id', sa.Integer()), sa.column('name', sa.String()))
+    for table, association, column, length in ASSOCIATIONS:
+        op.add_column(table, sa.Column('genres', sa.String(length=length), nullable=True))
+        entity = sa.table(table, sa.column('id', sa.Integer()), sa.column('genres', sa.String()))
+        links = sa.table(association, sa.column(column, sa.Integer()), sa.column('genre_id', sa.Integer()))
+        genres = {}
+        for entity_id, name in connection.execute(
+                sa.select(links.c[column], genre.c.name).select_from(
+                    links.join(genre, genre.c.id == links.c.genre_id)).order_by(genre.c.id)):
+            genres.setdefault(entity_id, []).append(name)
+        for entity_id, names in genres.items():
+            connection.execute(entity.update().where(entity.c.id == entity_id).values(genres=';'.join(names)))
+        op.drop_index('ix_{}_genre_id_{}'.format(association, column), table_name=association)
+        op.drop_table(association)
+    op.drop_table('Genre')
@@ -1,15 +1,48 @@
-from flask_sqlalchemy import SQLAlchemy
+from datetime import datetime
 
+from sqlalchemy import event
 
-db = SQLAlchemy()
+from database import RoutingSQLAlchemy, RoutingSession
+
+
+db = RoutingSQLAlchemy()
 
 #----------------------------------------------------------------------------#
 # Models.
 #----------------------------------------------------------------------------#
 
 
+class Genre(db.Model):
+    __tablename__ = 'Genre'
+
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(120), nullable=False, unique=True)
+
+
+# Association tables. The primary keys serve "genres of an entity"; the
+# (genre_id, entity_id) indexes serve genre-filtered listings and searches.
+venue_genres = db.Table(
+    'VenueGenre',
+    db.Column('venue_id', db.Integer, db.ForeignKey('Venue.id'), primary_key=True),
+    db.Column('genre_id', db.Integer, db.ForeignKey('Genre.id'), primary_key=True),
+    db.Index('ix_VenueGenre_genre_id_venue_id', 'genre_id', 'venue_id')
+)
+
+artist_genres = db.Table(
+    'ArtistGenre',
+    db.Column('artist_id', db.Integer, db.ForeignKey('Artist.id'), primary_key=True),
+    db.Column('genre_id', db.Integer, db.ForeignKey('Genre.id'), primary_key=True),
+    db.Index('ix_ArtistGenre_genre_id_artist_id', 'genre_id', 'artist_id')
+)
+
+
 class Venue(db.Model):
     __tablename__ = 'Venue'
+    __table_args__ = (
+        # /venues lists venues ordered by city and state
+        db.Index('ix_Venue_city_state', 'city', 'state'),
+        db.Index('ix_Venue_updated_at', 'updated_at'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String)
@@ -19,33 +52,175 @@ class Venue(db.Model):
     phone = db.Column(db.String(120))
     image_link = db.Column(db.String(500))
     facebook_link = db.Column(db.String(120))
-    genres = db.Column(db.String)
+    genres = db.relationship('Genre', secondary=venue_genres, lazy=True, order_by=Genre.id)
     seeking_talent = db.Column(db.Boolean)
     seeking_description = db.Column(db.String(500))
     website = db.Column(db.String(120))
+    # Maintained by counters.py, as of ShowRollover.rolled_over_at
+    upcoming_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    past_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    # UTC time of the last change to the row or to what its pages show,
+    # see touch_updated_at() and counters.py
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    shows = db.relationship('Show', back_populates='venue', lazy=True)
 
     # TODO: implement any missing fields, as a database migration using Flask-Migrate
 
 
 class Artist(db.Model):
     __tablename__ = 'Artist'
+    __table_args__ = (
+        db.Index('ix_Artist_updated_at', 'updated_at'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String)
     city = db.Column(db.String(120))
     state = db.Column(db.String(120))
     phone = db.Column(db.String(120))
-    genres = db.Column(db.String(120))
+    genres = db.relationship('Genre', secondary=artist_genres, lazy=True, order_by=Genre.id)
     image_link = db.Column(db.String(500))
     facebook_link = db.Column(db.String(120))
     website = db.Column(db.String(120))
     seeking_venue = db.Column(db.Boolean)
     seeking_description = db.Column(db.String(500))
+    # Maintained by counters.py, as of ShowRollover.rolled_over_at
+    upcoming_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    past_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    # UTC time of the last change to the row or to what its pages show,
+    # see touch_updated_at() and counters.py
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    shows = db.relationship('Show', back_populates='artist', lazy=True)
 
 class Show(db.Model):
     __tablename__ = 'Show'
+    __table_args__ = (
+        # Detail pages and the show counters read an entity's shows by time
+        db.Index('ix_Show_venue_id_start_time', 'venue_id', 'start_time'),
+        db.Index('ix_Show_artist_id_start_time', 'artist_id', 'start_time'),
+        # /shows keyset pagination and the counter rollover window
+        db.Index('ix_Show_start_time_id', 'start_time', 'id'),
+        db.Index('ix_Show_updated_at', 'updated_at'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     start_time = db.Column(db.DateTime)
     artist_id = db.Column(db.Integer, db.ForeignKey('Artist.id'))
-    venue_id = db.Column(db.Integer, db.ForeignKey('Venue.id'))
\ No newline at end of file
+    venue_id = db.Column(db.Integer, db.ForeignKey('Venue.id'))
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    artist = db.relationship('Artist', back_populates='shows')
+    venue = db.relationship('Venue', back_populates='shows')
+
+
+class ShowRollover(db.Model):
+    __tablename__ = 'ShowRollover'
+
+    # Single row: shows starting after rolled_over_at are counted as upcoming
+    id = db.Column(db.Integer, primary_key=True)
+    rolled_over_at = db.Column(db.DateTime, nullable=False)
+
+
+class TableVersion(db.Model):
+    __tablename__ = 'TableVersion'
+
+    # One row per table in VERSIONED_TABLES, bumped by every transaction
+    # that writes the table (see bump_table_versions): a primary key lookup
+    # that tells whether a listing, or the search index, is still current
+    name = db.Column(db.String(64), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+    # Bumped as well when the transaction deleted rows
+    deletions = db.Column(db.Integer, nullable=False, default=0)
+    # UTC time of the last bump
+    changed_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+
+VERSIONED_TABLES = ('Venue', 'Artist', 'Show')
+
+#----------------------------------------------------------------------------#
+# Change tracking.
+#----------------------------------------------------------------------------#
+
+
+def note_changes(session, table, deleted=False):
+    '''
+    Record that the session's transaction writes ``table`` (a name), for
+    bump_table_versions(). ORM flushes and statements run through the
+    session are noted automatically; call this for writes that bypass it,
+    such as COPY.
+    '''
+    if table in VERSIONED_TABLES:
+        changes = session.info.setdefault('table_changes', {})
+        changes[table] = changes.get(table, False) or deleted
+
+
+@event.listens_for(RoutingSession, 'do_orm_execute')
+def note_statement_changes(state):
+    # Bulk UPDATE, DELETE and INSERT statements, e.g. the show counters
+    if state.is_update or state.is_delete or state.is_insert:
+        note_changes(state.session, state.statement.table.name, deleted=state.is_delete)
+
+
+@event.listens_for(RoutingSession, 'before_commit')
+def bump_table_versions(session):
+    '''
+    Bump the TableVersion rows of the tables the transaction wrote, in the
+    same transaction, so the new versions become visible with the changes.
+    '''
+    # Flush first: it notes the changes still pending in the session
+    session.flush()
+    changes = session.info.pop('table_changes', None)
+    if not changes:
+        return
+    now = datetime.utcnow()
+    # Always in the same order, so concurrent writers lock the rows alike
+    for name, deleted in sorted(changes.items()):
+        values = {TableVersion.version: TableVersion.version + 1, TableVersion.changed_at: now}
+        if deleted:
+            values[TableVersion.deletions] = TableVersion.deletions + 1
+        if not session.query(TableVersion).filter(TableVersion.name == name).update(
+                values, synchronize_session=False):
+            session.add(TableVersion(name=name, version=1, deletions=int(deleted), changed_at=now))
+    session.flush()
+
+
+@event.listens_for(RoutingSession, 'after_transaction_end')
+def forget_table_changes(session, transaction):
+    if transaction.parent is None:
+        session.info.pop('table_changes', None)
+
+
+def table_versions(names):
+    '''
+    Return {name: (version, deletions, changed_at)} of the tables ``names``,
+    in one primary key lookup.
+    '''
+    return {name: (version, deletions, changed_at) for name, version, deletions, changed_at in db.session.query(
+        TableVersion.name, TableVersion.version, TableVersion.deletions, TableVersion.changed_at
+    ).filter(TableVersion.name.in_(names))}
+
+
+@event.listens_for(RoutingSession, 'before_flush')
+def touch_updated_at(session, flush_context, instances):
+    '''
+    Bump updated_at of every modified Venue, Artist or Show, including
+    changes to genres alone, which issue no UPDATE of the row. A renamed
+    artist or venue also shows up on the pages of the venues or artists it
+    has shows with, so those are bumped as well.
+    '''
+    now = datetime.utcnow()
+    for entity in list(session.new) + list(session.deleted):
+        if isinstance(entity, (Venue, Artist, Show)):
+            note_changes(session, entity.__tablename__, deleted=entity in session.deleted)
+    for entity in session.dirty:
+        if isinstance(entity, (Venue, Artist, Show)) and session.is_modified(entity):
+            note_changes(session, entity.__tablename__)
+            entity.updated_at = now
+            if isinstance(entity, Artist):
+                related, fk, own_fk = Venue, Show.venue_id, Show.artist_id
+            elif isinstance(entity, Venue):
+                related, fk, own_fk = Artist, Show.artist_id, Show.venue_id
+            else:
+                continue
+            session.query(related).filter(
+                related.id.in_(session.query(fk).filter(own_fk == entity.id))
+            ).update({related.updated_at: now}, synchronize_session=False)
@@ -0,0 +1,52 @@
+from datetime_format import show_time_now, show_time_to_utc
+from models import db, Show, Genre, table_versions
+
+#----------------------------------------------------------------------------#
+# Queries shared by the blueprints.
+#----------------------------------------------------------------------------#
+
+
+def genres_named(names):
+    # Genre rows for the names picked in a genres SelectMultipleField
+    return Genre.query.filter(Genre.name.in_(names)).order_by(Genre.id).all() if names else []
+
+
+def filter_by_genre(query, entity_id, association_id, genre):
+    # Restrict a Venue/Artist query to one genre through the
+    # (genre_id, entity_id) index of its association table.
+    association = association_id.table
+    return query.join(
+        association, association_id == entity_id
+    ).join(
+        Genre, Genre.id == association.c.genre_id
+    ).filter(Genre.name == genre)
+
+
+def listing_validators(*models):
+    # A listing changes only when one of the tables it shows is written,
+    # which bumps the table's TableVersion row: a primary key lookup rather
+    # than an aggregate over the table. The time of the last bump is the
+    # Last-Modified, and also advances with deletes.
+    versions = table_versions([model.__tablename__ for model in models])
+    last_modified = max((changed_at for version, deletions, changed_at in versions.values()), default=None)
+    return (last_modified,) + tuple(sorted(versions.items()))
+
+
+def detail_validators(model, fk, entity_id):
+    # The row version, and the start of the entity's latest show that has
+    # started: the page splits its shows into upcoming and past as of now,
+    # so it changes when the row does (show counters included, see
+    # counters.py) and whenever one of its shows starts. The later of the
+    # two is the Last-Modified. Returns None if there is no such row.
+    last_started = db.session.query(db.func.max(Show.start_time)).filter(
+        fk == entity_id, Show.start_time <= show_time_now()
+    ).scalar_subquery()
+    row = db.session.query(model.updated_at, last_started).filter(model.id == entity_id).first()
+    if row is None:
+        return None
+    updated_at, started_at = row
+    last_modified = updated_at
+    if started_at is not None:
+        # Show times are in SHOW_TIMEZONE, updated_at is UTC
+        last_modified = max(last_modified, show_time_to_utc(started_at))
+    return last_modified, updated_at, started_at
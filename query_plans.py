@@ -0,0 +1,159 @@
+import json
+import re
+
+from sqlalchemy import event
+
+from models import db, Artist, Venue
+
+#----------------------------------------------------------------------------#
+# Query plan guard.
+#----------------------------------------------------------------------------#
+
+# Tables that grow with the catalog; a full scan of one of these from a
+# request, sequential or through a whole index, is a plan regression.
+LARGE_TABLES = {'Artist', 'Venue', 'Show', 'ArtistGenre', 'VenueGenre'}
+
+# Pages that list a whole table by design, as endpoint -> {table: index}:
+# the one ordered walk each may make, through that index (None for the
+# primary key order). Any other full scan, e.g. an aggregate over the
+# table, is still a violation. Walks cut short by a LIMIT, such as a page
+# of /shows, are not full scans to begin with.
+ALLOWED_WALKS = {
+    # Every artist in id order
+    'artists.artists': {'Artist': None},
+    # Every venue in (city, state) order
+    'venues.venues': {'Venue': 'ix_Venue_city_state'},
+    # A whole table, streamed in id order
+    'main.export': {'Artist': None, 'Venue': None, 'Show': None},
+}
+
+# Requests beyond the plain GET of every route: filters and searches.
+# Search terms are at least three characters long so the trigram/FTS
+# indexes can serve them; shorter terms scan by design (see search.py).
+EXTRA_REQUESTS = [
+    ('GET', '/venues?genre=Jazz', None),
+    ('GET', '/artists?genre=Jazz', None),
+    ('GET', '/shows?from=2020-01-01&to=2030-01-01', None),
+    ('POST', '/venues/search', {'search_term': 'hall'}),
+    ('POST', '/venues/search', {'search_term': 'hall', 'genre': 'Jazz'}),
+    ('POST', '/artists/search', {'search_term': 'band'}),
+    ('POST', '/artists/search', {'search_term': 'band', 'genre': 'Jazz'}),
+]
+
+SQLITE_PLAN_RE = re.compile(r'(SCAN|SEARCH) (?:TABLE )?"?(\w+)"?(?: USING (?:COVERING )?INDEX (\w+))?')
+LIMIT_RE = re.compile(r'\bLIMIT\b', re.IGNORECASE)
+ORDER_BY_RE = re.compile(r'\bORDER BY\b', re.IGNORECASE)
+
+
+def explain(connection, statement, parameters):
+    '''
+    Return the full scans of ``statement``, as a set of (table, index) walks
+    (index None for the table itself, in primary key order), and the raw
+    plan. On PostgreSQL sequential scans are disabled while planning, so a
+    Seq Scan or an index scan without an index condition means no index can
+    narrow the statement down. Index walks stopped early by a LIMIT, without
+    a sort in between, are not counted.
+    '''
+    cursor = connection.connection.cursor()
+    try:
+        if connection.dialect.name == 'postgresql':
+            cursor.execute('SET enable_seqscan = off')
+            cursor.execute('EXPLAIN (FORMAT JSON) ' + statement, parameters)
+            plan = cursor.fetchone()[0]
+            cursor.execute('RESET enable_seqscan')
+            walks = set()
+
+            def walk(node, limited=False):
+                node_type = node.get('Node Type')
+                table = node.get('Relation Name')
+                if node_type == 'Seq Scan':
+                    walks.add((table, None))
+                elif node_type in ('Index Scan', 'Index Only Scan') and 'Index Cond' not in node and not limited:
+                    index = node.get('Index Name')
+                    walks.add((table, None if index == '{}_pkey'.format(table) else index))
+                if node_type == 'Limit':
+                    limited = True
+                elif node_type not in ('Nested Loop', 'Subquery Scan'):
+                    # Anything else may read all of its input first
+                    limited = False
+                for child in node.get('Plans', []):
+                    walk(child, limited)
+            walk(plan[0]['Plan'])
+            return walks, json.dumps(plan, indent=1)
+        if connection.dialect.name == 'sqlite':
+            cursor.execute('EXPLAIN QUERY PLAN ' + statement, parameters)
+            lines = [row[-1] for row in cursor.fetchall()]
+            limited = LIMIT_RE.search(statement) and not any('TEMP B-TREE' in line for line in lines)
+            walks = set()
+            for line in lines:
+                # "SCAN t [USING INDEX i]" walks the whole table or index, and
+                # an AUTOMATIC index is built from a full scan as well
+                match = SQLITE_PLAN_RE.match(line)
+                if match is None or not (match.group(1) == 'SCAN' or 'AUTOMATIC' in line):
+                    continue
+                if limited and match.group(3) and 'AUTOMATIC' not in line:
+                    continue
+                walks.add((match.group(2), match.group(3)))
+            return walks, '\n'.join(lines)
+        return set(), ''
+    finally:
+        cursor.close()
+
+
+def route_requests(app):
+    # A plain request for every GET route, with ids taken from the database
+    venue = Venue.query.order_by(Venue.id).first()
+    artist = Artist.query.order_by(Artist.id).first()
+    ids = {'venue_id': venue.id, 'artist_id': artist.id, 'kind': 'venues'}
+    requests = []
+    for rule in app.url_map.iter_rules():
+        if rule.endpoint == 'static' or 'GET' not in rule.methods:
+            continue
+        url = rule.build({arg: ids[arg] for arg in rule.arguments})[1]
+        requests.append(('GET', url, None))
+    return requests + EXTRA_REQUESTS
+
+
+def check_query_plans(app):
+    '''
+    Run every route of ``app`` against its database, which must have venues
+    and artists, and EXPLAIN each SELECT it issues. Only reads are requested.
+    Returns a list of (method, url, endpoint, tables, statement, plan)
+    violations: statements that fully scan a large table.
+    '''
+    with app.app_context():
+        requests = route_requests(app)
+        engine = db.engine
+
+    client = app.test_client()
+    # The first request also builds the in-memory search indexes, which
+    # reads whole tables on purpose
+    client.get('/')
+
+    captured = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        # EXPLAIN right away, on the connection and in the transaction that
+        # ran the statement
+        if not executemany and statement.lstrip().upper().startswith(('SELECT', 'WITH')):
+            walks, plan = explain(conn, statement, parameters)
+            captured.append((walks, statement, plan))
+
+    violations = []
+    event.listen(engine, 'after_cursor_execute', capture)
+    try:
+        for method, url, data in requests:
+            del captured[:]
+            response = client.open(url, method=method, data=data)
+            endpoint = app.url_map.bind('').match(url.split('?')[0], method=method)[0]
+            allowed = ALLOWED_WALKS.get(endpoint, {})
+            for walks, statement, plan in captured:
+                scanned = {table for table, index in walks if table in LARGE_TABLES and not (
+                    ORDER_BY_RE.search(statement) and allowed.get(table, False) == index)}
+                if scanned:
+                    violations.append((method, url, endpoint, sorted(scanned), statement, plan))
+            if response.status_code >= 500:
+                violations.append((method, url, endpoint, [], 'HTTP {}'.format(response.status_code), ''))
+    finally:
+        event.remove(engine, 'after_cursor_execute', capture)
+    return violations
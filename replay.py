@@ -0,0 +1,231 @@
+import functools
+import http.client
+import json
+import random
+import threading
+import time
+from collections import defaultdict
+from itertools import islice
+from queue import Queue
+from urllib.parse import urlencode, urlsplit
+
+from werkzeug.exceptions import HTTPException
+
+from models import db, Artist, Venue
+from benchmarks import percentile
+from database import READ_METHODS
+
+#----------------------------------------------------------------------------#
+# Traffic replay.
+#----------------------------------------------------------------------------#
+
+# Replays a JSONL request log, one {"method", "path"[, "data"]} object per
+# line, against the app in-process or on a running server, and reports
+# throughput, latency percentiles and error rates per endpoint. The log is
+# streamed, so its size does not matter.
+#
+# The SQL profile log has this shape too, with the form data of read-only
+# POSTs such as the searches (see sql_profiler.py). Other POSTs are logged
+# without their form, and records of them are skipped rather than replayed
+# as empty submissions.
+
+# (weight, kind) of the requests in a synthetic traffic log
+TRAFFIC_MIX = (
+    (30, 'browse'),
+    (25, 'detail'),
+    (25, 'search'),
+    (15, 'autocomplete'),
+    (5, 'create'),
+)
+SEARCH_TERMS = ('hall', 'club', 'band', 'trio', 'blue', 'moon', 'river', 'jazz')
+
+
+def read_log(path, limit=None):
+    '''
+    Yield the requests of a JSONL log as (method, path, data) tuples, up to
+    ``limit`` of them.
+    '''
+    with open(path, encoding='utf-8') as f:
+        records = (json.loads(line) for line in f if line.strip())
+        for record in islice(records, limit):
+            yield record.get('method', 'GET'), record['path'], record.get('data')
+
+
+def traffic_log(count, seed=42):
+    '''
+    Generate ``count`` requests of mixed browse, detail, search,
+    autocomplete and create traffic over the venues and artists in the
+    database, deterministically for a given seed.
+    '''
+    rng = random.Random(seed)
+    venue_ids = [venue_id for venue_id, in db.session.query(Venue.id).order_by(Venue.id)]
+    artist_ids = [artist_id for artist_id, in db.session.query(Artist.id).order_by(Artist.id)]
+    weights, kinds = zip(*TRAFFIC_MIX)
+    records = []
+    for kind in rng.choices(kinds, weights, k=count):
+        entity = rng.choice(('venues', 'artists'))
+        if kind == 'browse':
+            record = {'method': 'GET', 'path': rng.choice(('/venues', '/artists', '/shows'))}
+        elif kind == 'detail':
+            entity_id = rng.choice(venue_ids if entity == 'venues' else artist_ids)
+            record = {'method': 'GET', 'path': '/{}/{}'.format(entity, entity_id)}
+        elif kind == 'search':
+            record = {'method': 'POST', 'path': '/{}/search'.format(entity),
+                      'data': {'search_term': rng.choice(SEARCH_TERMS)}}
+        elif kind == 'autocomplete':
+            term = rng.choice(SEARCH_TERMS)
+            record = {'method': 'GET', 'path': '/search/autocomplete?' + urlencode(
+                {'q': term[:rng.randint(2, len(term))]})}
+        else:
+            record = {'method': 'POST', 'path': '/shows/create', 'data': {
+                'artist_id': rng.choice(artist_ids), 'venue_id': rng.choice(venue_ids),
+                'start_time': '2030-{:02d}-{:02d} 20:00:00'.format(rng.randint(1, 12), rng.randint(1, 28))}}
+        records.append(record)
+    return records
+
+
+class ReplayStats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        # Records of writes without their form data, not replayed
+        self.skipped = 0
+        self.started = time.perf_counter()
+        self.finished = None
+
+    def record(self, endpoint, latency, error):
+        with self.lock:
+            self.latencies[endpoint].append(latency)
+            if error:
+                self.errors[endpoint] += 1
+
+    def report(self):
+        '''
+        Return {endpoint: {requests, rps, p50_ms, p95_ms, p99_ms,
+        error_rate}}, with the totals under "*".
+        '''
+        elapsed = (self.finished or time.perf_counter()) - self.started
+        report = {}
+        everything = []
+        for endpoint, latencies in sorted(self.latencies.items()):
+            everything.extend(latencies)
+            report[endpoint] = self._summary(latencies, self.errors[endpoint], elapsed)
+        if everything:
+            report['*'] = self._summary(everything, sum(self.errors.values()), elapsed)
+        return report
+
+    @staticmethod
+    def _summary(latencies, errors, elapsed):
+        latencies = sorted(latencies)
+        return {
+            'requests': len(latencies),
+            'rps': round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+            'p50_ms': round(percentile(latencies, 50) * 1000, 3),
+            'p95_ms': round(percentile(latencies, 95) * 1000, 3),
+            'p99_ms': round(percentile(latencies, 99) * 1000, 3),
+            'error_rate': round(errors / len(latencies), 4),
+        }
+
+
+class InProcessTarget:
+    def __init__(self, app):
+        self.app = app
+        self.local = threading.local()
+
+    def __call__(self, method, path, data):
+        # One test client per worker thread
+        client = getattr(self.local, 'client', None)
+        if client is None:
+            client = self.local.client = self.app.test_client()
+        response = client.open(path, method=method, data=data)
+        response.get_data()
+        return response.status_code
+
+
+class HTTPTarget:
+    def __init__(self, url, timeout=30):
+        parts = urlsplit(url)
+        self.host = parts.hostname
+        self.port = parts.port or 80
+        self.prefix = parts.path.rstrip('/')
+        self.timeout = timeout
+        self.local = threading.local()
+
+    def __call__(self, method, path, data):
+        # One keep-alive connection per worker thread, reopened after errors
+        connection = getattr(self.local, 'connection', None)
+        if connection is None:
+            connection = self.local.connection = http.client.HTTPConnection(
+                self.host, self.port, timeout=self.timeout)
+        body = urlencode(data, doseq=True) if data else None
+        headers = {'Content-Type': 'application/x-www-form-urlencoded'} if body else {}
+        try:
+            connection.request(method, self.prefix + path, body, headers)
+            response = connection.getresponse()
+            response.read()
+            return response.status
+        except (OSError, http.client.HTTPException):
+            connection.close()
+            self.local.connection = None
+            raise
+
+
+def endpoint_of(app, method, path):
+    try:
+        return app.url_map.bind('').match(path.split('?')[0], method=method)[0]
+    except HTTPException:
+        return path.split('?')[0]
+
+
+def replay(app, records, concurrency=4, rate=None, url=None):
+    '''
+    Send ``records``, any iterable, from ``concurrency`` threads, to ``url``
+    or to ``app`` in-process. With ``rate`` requests are started on an
+    open-loop schedule of that many per second, and latencies are measured
+    from the scheduled start, so time spent waiting for a free thread
+    counts; otherwise each thread sends its next request as soon as the
+    previous one returns. Returns the ReplayStats.
+    '''
+    target = HTTPTarget(url) if url else InProcessTarget(app)
+    endpoint = functools.lru_cache(maxsize=4096)(functools.partial(endpoint_of, app))
+    # Bounded, so records are read only as fast as they are sent
+    queue = Queue(maxsize=concurrency * 4)
+    stats = ReplayStats()
+
+    def work():
+        while True:
+            index, record = queue.get()
+            if record is None:
+                return
+            method, path, data = record
+            name = endpoint(method, path)
+            if rate:
+                started = stats.started + index / rate
+                delay = started - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+            else:
+                started = time.perf_counter()
+            try:
+                error = target(method, path, data) >= 500
+            except Exception:
+                error = True
+            stats.record(name, time.perf_counter() - started, error)
+
+    threads = [threading.Thread(target=work, daemon=True) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    index = 0
+    for method, path, data in records:
+        if method not in READ_METHODS and data is None:
+            stats.skipped += 1
+            continue
+        queue.put((index, (method, path, data)))
+        index += 1
+    for _ in threads:
+        queue.put((None, None))
+    for thread in threads:
+        thread.join()
+    stats.finished = time.perf_counter()
+    return stats
@@ -0,0 +1,100 @@
+from flask import current_app
+from sqlalchemy import Float, Integer, text
+
+from models import db, Genre
+from queries import filter_by_genre
+
+#----------------------------------------------------------------------------#
+# Search.
+#----------------------------------------------------------------------------#
+
+# Columns matched by the venue and artist searches
+SEARCH_COLUMNS = ('name', 'city', 'state')
+
+# FTS5 trigram queries only match substrings of at least this many characters
+MIN_TRIGRAM_TERM = 3
+
+
+# Escape character for LIKE patterns, chosen to need no quoting on any backend
+LIKE_ESCAPE = '/'
+
+
+def escape_like(term):
+    return term.replace(LIKE_ESCAPE, LIKE_ESCAPE * 2).replace(
+        '%', LIKE_ESCAPE + '%').replace('_', LIKE_ESCAPE + '_')
+
+
+def genre_association_id(model):
+    # The entity id column of the model's genre association table
+    association = model.genres.property.secondary
+    return next(column for column in association.c if column.references(model.__table__.c.id))
+
+
+def _ranked_like(model, term, limit, genre):
+    # Portable fallback: plain case-insensitive substring match, by name
+    pattern = '%{}%'.format(escape_like(term))
+    columns = [getattr(model, name) for name in SEARCH_COLUMNS]
+    query = db.session.query(
+        model.id.label('id'),
+        db.literal(0.0).label('rank')
+    ).filter(
+        db.or_(*[column.ilike(pattern, escape=LIKE_ESCAPE) for column in columns])
+    )
+    if genre:
+        query = filter_by_genre(query, model.id, genre_association_id(model), genre)
+    return query.order_by(model.name, model.id).limit(limit).subquery()
+
+
+def _ranked_postgresql(model, term, limit, genre):
+    # ILIKE is answered from the pg_trgm GIN indexes on each column, and
+    # rows are ranked by their best trigram similarity to the term.
+    pattern = '%{}%'.format(escape_like(term))
+    columns = [getattr(model, name) for name in SEARCH_COLUMNS]
+    score = db.func.greatest(*[db.func.similarity(column, term) for column in columns])
+    query = db.session.query(
+        model.id.label('id'),
+        (-score).label('rank')
+    ).filter(
+        db.or_(*[column.ilike(pattern, escape=LIKE_ESCAPE) for column in columns])
+    )
+    if genre:
+        query = filter_by_genre(query, model.id, genre_association_id(model), genre)
+    return query.order_by(-score, model.id).limit(limit).subquery()
+
+
+def _ranked_sqlite(model, term, limit, genre):
+    # "<table>_search" is an FTS5 trigram table kept in sync by triggers,
+    # see the add_search_indexes migration. rank is bm25, lower is better.
+    if len(term) < MIN_TRIGRAM_TERM:
+        return _ranked_like(model, term, limit, genre)
+    table = '"{}_search"'.format(model.__tablename__)
+    parameters = {'query': '"{}"'.format(term.replace('"', '""')), 'limit': limit}
+    join = ''
+    if genre:
+        association_id = genre_association_id(model)
+        join = (' JOIN "{1}" ON "{1}".{2} = {0}.rowid'
+                ' JOIN "{3}" ON "{3}".id = "{1}".genre_id AND "{3}".name = :genre').format(
+            table, association_id.table.name, association_id.name, Genre.__tablename__)
+        parameters['genre'] = genre
+    return text(
+        'SELECT {0}.rowid AS id, {0}.rank AS rank FROM {0}{1} WHERE {0} MATCH :query '
+        'ORDER BY {0}.rank LIMIT :limit'.format(table, join)
+    ).bindparams(**parameters).columns(id=Integer, rank=Float).subquery()
+
+
+def ranked_matches(model, term, limit=None, genre=None):
+    '''
+    Return a subquery of (id, rank) for the rows of ``model`` whose name, city
+    or state contains ``term``, and with ``genre`` if given, best match first
+    (lowest rank). At most ``limit`` rows are returned, SEARCH_RESULT_LIMIT by
+    default.
+    '''
+    if limit is None:
+        limit = current_app.config['SEARCH_RESULT_LIMIT']
+    term = term.strip()
+    dialect = db.engine.dialect.name
+    if dialect == 'postgresql':
+        return _ranked_postgresql(model, term, limit, genre)
+    if dialect == 'sqlite':
+        return _ranked_sqlite(model, term, limit, genre)
+    return _ranked_like(model, term, limit, genre)
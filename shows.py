@@ -0,0 +1,135 @@
+from datetime import datetime
+
+from flask import Blueprint, current_app, flash, redirect, render_template, request, url_for
+
+from models import db, Artist, Venue, Show
+from counters import count_new_show
+from entity_cache import venue_cache, artist_cache
+from conditional import conditional
+from queries import listing_validators
+
+#----------------------------------------------------------------------------#
+# Shows.
+#----------------------------------------------------------------------------#
+
+bp = Blueprint('shows', __name__)
+
+
+def parse_show_cursor(cursor):
+    # Keyset cursor for /shows: "<start_time isoformat>,<show id>"
+    start_time, show_id = cursor.rsplit(',', 1)
+    return datetime.fromisoformat(start_time), int(show_id)
+
+
+@bp.route('/shows')
+def shows():
+    # displays list of shows at /shows
+    # Shows are paged by keyset on (start_time, id) rather than OFFSET, so
+    # every page is an index range scan of the same size however deep it is.
+    args = request.args
+    try:
+        date_from = datetime.fromisoformat(args['from']) if args.get('from') else None
+        date_to = datetime.fromisoformat(args['to']) if args.get('to') else None
+        cursor = parse_show_cursor(args['cursor']) if args.get('cursor') else None
+    except ValueError:
+        flash('Invalid shows filter!', 'error')
+        return redirect('/shows')
+
+    # Tiles show the artist and venue names too
+    not_modified = conditional(*listing_validators(Show, Artist, Venue))
+    if not_modified:
+        return not_modified
+
+    query = db.session.query(
+        Show.id,
+        Show.start_time,
+        Venue.id,
+        Venue.name,
+        Artist.id,
+        Artist.name,
+        Artist.image_link
+    ).join(Show.venue).join(Show.artist)
+    if date_from:
+        query = query.filter(Show.start_time >= date_from)
+    if date_to:
+        query = query.filter(Show.start_time < date_to)
+    if cursor:
+        query = query.filter(db.tuple_(Show.start_time, Show.id) > cursor)
+
+    per_page = current_app.config['SHOWS_PER_PAGE']
+    # One extra row tells us whether there is a next page
+    rows = query.order_by(Show.start_time, Show.id).limit(per_page + 1).all()
+
+    data = []
+    for show_id, start_time, venue_id, venue_name, artist_id, artist_name, artist_image_link in rows[:per_page]:
+        data.append({
+            "id": show_id,
+            "venue_id": venue_id,
+            "venue_name": venue_name,
+            "artist_id": artist_id,
+            "artist_name": artist_name,
+            "artist_image_link": artist_image_link,
+            "start_time": start_time
+        })
+
+    next_url = None
+    if len(rows) > per_page:
+        last_id, last_start_time = rows[per_page - 1][:2]
+        next_args = {k: v for k, v in args.items() if k in ('from', 'to') and v}
+        next_args['cursor'] = '{},{}'.format(last_start_time.isoformat(), last_id)
+        next_url = url_for('shows.shows', **next_args)
+
+    return render_template('pages/shows.html', shows=data, next_url=next_url)
+
+
+@bp.route('/shows/create')
+def create_shows():
+    # renders form. do not touch.
+    from forms import ShowForm
+    form = ShowForm()
+    return render_template('forms/new_show.html', form=form)
+
+
+@bp.route('/shows/create', methods=['POST'])
+def create_show_submission():
+    # called to create new shows in the db, upon submitting new show listing form
+    # TODO: insert form data as a new Show record in the db, instead
+    from bulk_import import parse_datetime
+    try:
+        # on successful db insert, flash success
+        form_data = request.form
+        artist = artist_cache.get(int(form_data['artist_id']))
+        # Check if artist to link exists
+        if not artist:
+            flash('Incorrect artist selected for the show!')
+            return redirect('/shows/create')
+        venue = venue_cache.get(int(form_data['venue_id']))
+        # Check if Venue to link to the show exist
+        if not venue:
+            flash('Incorrect venue selected for the show!')
+            return redirect('/shows/create')
+
+        show = Show(
+            start_time=parse_datetime(form_data['start_time']),
+            artist_id=artist['id'],
+            venue_id=venue['id']
+        )
+
+        db.session.add(show)
+        count_new_show(show)
+        db.session.commit()
+
+        flash('New show starting ay ' +
+              request.form['start_time'] +
+              ' was successfully created!')
+    except:
+        # TODO: on unsuccessful db insert, flash an error instead.
+        db.session.rollback()
+        flash('An error occurred. New show ' +
+              request.form['start_time'] + ' could not be created.')
+        current_app.logger.exception('Could not create show')
+    finally:
+        db.session.close()
+    # e.g., flash('An error occurred. Show could not be listed.')
+    # see: http://flask.pocoo.org/docs/1.0/patterns/flashing/
+    return render_template('pages/home.html')
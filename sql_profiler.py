@@ -0,0 +1,116 @@
+import json
+import logging
+import random
+import re
+import time
+from collections import Counter
+from datetime import datetime
+
+from flask import g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from database import is_read_only
+from log_pipeline import SQL_PROFILE_LOGGER
+
+#----------------------------------------------------------------------------#
+# SQL profiler.
+#----------------------------------------------------------------------------#
+
+# Per-request statement counts, database time and repeated statements,
+# collected from engine events for a sampled share of requests
+# (SQL_PROFILE_SAMPLE_RATE) and appended as one JSON line per request to
+# SQL_PROFILE_LOG through the logging pipeline. Unsampled requests pay for one random() call and two
+# attribute lookups per statement.
+
+logger = logging.getLogger(SQL_PROFILE_LOGGER)
+
+# Expanded IN lists and VALUES rows, "(?, ?, ?)" -> "(?)"
+PLACEHOLDER_LIST_RE = re.compile(r'\(\s*(?:\?|%s|%\(\w+\)s|:\w+)(?:\s*,\s*(?:\?|%s|%\(\w+\)s|:\w+))+\s*\)')
+WHITESPACE_RE = re.compile(r'\s+')
+# Longest statement text written to the log
+STATEMENT_LOG_LENGTH = 300
+
+
+def statement_shape(statement):
+    '''
+    Normalize a statement so executions that differ only in their bound
+    parameters, or in the length of an IN list, compare equal.
+    '''
+    return PLACEHOLDER_LIST_RE.sub('(?)', WHITESPACE_RE.sub(' ', statement).strip())
+
+
+class RequestProfile:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db_time = 0.0
+        self.shapes = Counter()
+
+    def record(self, statement, duration):
+        self.queries += 1
+        self.db_time += duration
+        self.shapes[statement_shape(statement)] += 1
+
+    def record_for(self, response, threshold):
+        repeated = [{'statement': shape[:STATEMENT_LOG_LENGTH], 'count': count}
+                    for shape, count in self.shapes.most_common() if count > 1]
+        record = {
+            'time': datetime.utcnow().isoformat(timespec='milliseconds') + 'Z',
+            'method': request.method,
+            'path': request.full_path.rstrip('?'),
+            'endpoint': request.endpoint,
+            'status': response.status_code,
+            'duration_ms': round((time.perf_counter() - self.started) * 1000, 3),
+            'queries': self.queries,
+            'db_ms': round(self.db_time * 1000, 3),
+            'repeated': repeated,
+            # Same statement shape run `threshold` or more times in a request
+            'n_plus_one': any(entry['count'] >= threshold for entry in repeated),
+        }
+        if request.form and is_read_only():
+            # The search form, so the log replays as is (see replay.py);
+            # the forms of writes are left out
+            record['data'] = request.form.to_dict(flat=False)
+        return record
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if has_request_context() and g.get('sql_profile') is not None:
+        context._sql_profile_started = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if has_request_context():
+        profile = g.get('sql_profile')
+        started = getattr(context, '_sql_profile_started', None)
+        if profile is not None and started is not None:
+            profile.record(statement, time.perf_counter() - started)
+
+
+def init_sql_profiler(app):
+    '''
+    Register the request hooks and engine listeners that profile a sample
+    of ``app``'s requests.
+    '''
+    rate = app.config['SQL_PROFILE_SAMPLE_RATE']
+    if rate <= 0:
+        return
+    threshold = app.config['SQL_PROFILE_N_PLUS_ONE']
+
+    # Listening on the Engine class covers the primary and replica binds
+    if not event.contains(Engine, 'before_cursor_execute', _before_cursor_execute):
+        event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+
+    @app.before_request
+    def start_sql_profile():
+        g.sql_profile = RequestProfile() if random.random() < rate else None
+
+    @app.after_request
+    def write_sql_profile(response):
+        profile = g.get('sql_profile')
+        if profile is not None:
+            g.sql_profile = None
+            logger.info(json.dumps(profile.record_for(response, threshold)))
+        return response
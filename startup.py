@@ -0,0 +1,105 @@
+import json
+import os
+import platform
+import re
+import statistics
+import subprocess
+import sys
+from datetime import datetime
+
+from benchmarks import NOISE_FLOOR_MS
+
+#----------------------------------------------------------------------------#
+# Startup benchmark.
+#----------------------------------------------------------------------------#
+
+# Time to a first response of a fresh process, in three phases: importing
+# app.py, create_app() and the first request, which also builds the search
+# indexes. Every run is a new interpreter, so nothing is already imported.
+
+basedir = os.path.abspath(os.path.dirname(__file__))
+
+PHASES = ('import_ms', 'create_app_ms', 'first_request_ms', 'total_ms')
+
+STARTUP_SCRIPT = '''
+import json, sys, time
+started = time.perf_counter()
+import app
+imported = time.perf_counter()
+flask_app = app.create_app()
+created = time.perf_counter()
+response = flask_app.test_client().get(sys.argv[1])
+response.get_data()
+answered = time.perf_counter()
+print(json.dumps({
+    'status': response.status_code,
+    'import_ms': (imported - started) * 1000,
+    'create_app_ms': (created - imported) * 1000,
+    'first_request_ms': (answered - created) * 1000,
+    'total_ms': (answered - started) * 1000,
+}))
+'''
+
+IMPORT_TIME = re.compile(r'import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)')
+
+
+def run_once(path, *options):
+    completed = subprocess.run(
+        [sys.executable] + list(options) + ['-c', STARTUP_SCRIPT, path],
+        cwd=basedir, capture_output=True, text=True)
+    if completed.returncode != 0:
+        raise RuntimeError('Startup run failed:\n' + completed.stderr)
+    return json.loads(completed.stdout.strip().splitlines()[-1]), completed.stderr
+
+
+def measure_startup(runs=10, path='/'):
+    '''
+    Start the app ``runs`` times, each in a new interpreter answering one
+    request for ``path``, and return the median milliseconds of every phase.
+    '''
+    timings = [run_once(path)[0] for i in range(runs)]
+    statuses = {timing['status'] for timing in timings}
+    return {
+        'meta': {
+            'time': datetime.utcnow().isoformat(timespec='seconds') + 'Z',
+            'runs': runs,
+            'path': path,
+            'status': max(statuses),
+            'python': platform.python_version(),
+        },
+        'phases': {
+            phase: round(statistics.median(timing[phase] for timing in timings), 3)
+            for phase in PHASES
+        },
+    }
+
+
+def slowest_imports(count=15, path='/'):
+    '''
+    Return (module, cumulative milliseconds) of the ``count`` top-level
+    imports, app.py's own and those made later by create_app() or the first
+    request, that took longest, from one run under ``python -X importtime``.
+    '''
+    stderr = run_once(path, '-X', 'importtime')[1]
+    modules = []
+    for line in stderr.splitlines():
+        match = IMPORT_TIME.match(line)
+        # Nested imports are indented below the one that caused them
+        if match and len(match.group(3)) == 1:
+            modules.append((match.group(4), int(match.group(2)) / 1000))
+    return sorted(modules, key=lambda module: -module[1])[:count]
+
+
+def compare_startup(results, baseline, tolerance=0.25):
+    '''
+    Return (phase, baseline value, value) for every phase more than
+    ``tolerance`` slower than in ``baseline``.
+    '''
+    regressions = []
+    for phase, current in results['phases'].items():
+        previous = baseline['phases'].get(phase)
+        if previous is None:
+            continue
+        if current > previous * (1 + tolerance) and current - previous > NOISE_FLOOR_MS:
+            regressions.append((phase, previous, current))
+    return regressions
@@ -0,0 +1,167 @@
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import posixpath
+import re
+import shutil
+
+from flask import request, send_from_directory
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+#----------------------------------------------------------------------------#
+# Static assets.
+#----------------------------------------------------------------------------#
+
+# `flask build-assets` copies every file under static/ to static/dist/ with
+# a hash of its content in the name (css/main.css -> css/main.1a2b3c4d5e6f.css),
+# writes .gz (and, with the brotli package, .br) variants next to the
+# compressible ones and a manifest of the names. At runtime
+# url_for('static', filename='css/main.css') points at the hashed copy,
+# which is served precompressed and cached by browsers for a year: its name
+# changes whenever its content does.
+
+DIST = 'dist'
+MANIFEST = 'manifest.json'
+# A year, as far as HTTP caches go
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+# Formats worth compressing; images and woff are compressed already
+COMPRESSIBLE_EXTENSIONS = {'.css', '.js', '.svg', '.otf', '.ttf', '.eot', '.json', '.map', '.txt', '.html', '.ico'}
+# Below this many bytes compression saves less than its headers cost
+MIN_COMPRESS_SIZE = 256
+
+CSS_URL = re.compile(r'''url\(\s*(['"]?)([^'")]+)\1\s*\)''')
+
+
+def hashed_name(name, content):
+    root, ext = posixpath.splitext(name)
+    return '{}.{}{}'.format(root, hashlib.sha256(content).hexdigest()[:12], ext)
+
+
+def rewrite_css_urls(name, content, manifest):
+    # Point url(...) references to other assets at their hashed copies;
+    # the directory layout is the same under dist/
+    directory = posixpath.dirname(name)
+
+    def rewrite(match):
+        quote, url = match.groups()
+        path, suffix = re.match(r'([^?#]*)(.*)', url).groups()
+        target = posixpath.normpath(posixpath.join(directory, path))
+        if '//' in url or url.startswith('data:') or target not in manifest:
+            return match.group(0)
+        return 'url({0}{1}{2}{0})'.format(
+            quote, posixpath.relpath(manifest[target], directory or '.'), suffix)
+    return CSS_URL.sub(rewrite, content.decode('utf-8')).encode('utf-8')
+
+
+def write_compressed(path, content):
+    if os.path.splitext(path)[1] not in COMPRESSIBLE_EXTENSIONS or len(content) < MIN_COMPRESS_SIZE:
+        return
+    with open(path + '.gz', 'wb') as f:
+        # mtime=0 keeps the output of a build reproducible
+        f.write(gzip.compress(content, compresslevel=9, mtime=0))
+    if brotli is not None:
+        with open(path + '.br', 'wb') as f:
+            f.write(brotli.compress(content, quality=11))
+
+
+def build_assets(static_folder):
+    '''
+    Rebuild static/dist/ and its manifest from the files under
+    ``static_folder``. Returns the manifest, {source name: hashed name}.
+    '''
+    output = os.path.join(static_folder, DIST)
+    shutil.rmtree(output, ignore_errors=True)
+    names = []
+    for directory, subdirectories, files in os.walk(static_folder):
+        if directory == static_folder and DIST in subdirectories:
+            subdirectories.remove(DIST)
+        for file in files:
+            path = os.path.relpath(os.path.join(directory, file), static_folder)
+            names.append(path.replace(os.sep, '/'))
+
+    manifest = {}
+    # Stylesheets last, so the assets they reference are hashed already
+    for name in sorted(names, key=lambda name: (name.endswith('.css'), name)):
+        with open(os.path.join(static_folder, name), 'rb') as f:
+            content = f.read()
+        if name.endswith('.css'):
+            content = rewrite_css_urls(name, content, manifest)
+        manifest[name] = hashed_name(name, content)
+        path = os.path.join(output, manifest[name])
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as f:
+            f.write(content)
+        write_compressed(path, content)
+
+    with open(os.path.join(output, MANIFEST), 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+        f.write('\n')
+    return manifest
+
+
+def manifest_path(static_folder):
+    return os.path.join(static_folder, DIST, MANIFEST)
+
+
+def load_manifest(static_folder):
+    try:
+        with open(manifest_path(static_folder)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+class StaticAssets:
+    def __init__(self):
+        self.manifest = {}
+        self.static_folder = None
+        self.fallback = None
+
+    def url_defaults(self, endpoint, values):
+        # Makes url_for('static', filename=...) manifest-aware
+        if endpoint == 'static':
+            hashed = self.manifest.get(values.get('filename'))
+            if hashed is not None:
+                values['filename'] = DIST + '/' + hashed
+
+    def send(self, filename):
+        '''
+        View of the static endpoint: hashed files are served immutable and,
+        where the client accepts it, precompressed; anything else as Flask
+        would.
+        '''
+        if not filename.startswith(DIST + '/'):
+            return self.fallback(filename=filename)
+        accepted = request.accept_encodings
+        for encoding, extension in (('br', '.br'), ('gzip', '.gz')):
+            if accepted[encoding] and os.path.isfile(os.path.join(self.static_folder, filename + extension)):
+                response = send_from_directory(
+                    self.static_folder, filename + extension,
+                    mimetype=mimetypes.guess_type(filename)[0], max_age=IMMUTABLE_MAX_AGE)
+                response.headers['Content-Encoding'] = encoding
+                break
+        else:
+            response = send_from_directory(self.static_folder, filename, max_age=IMMUTABLE_MAX_AGE)
+        response.vary.add('Accept-Encoding')
+        response.cache_control.public = True
+        response.cache_control.immutable = True
+        return response
+
+
+def init_static_assets(app):
+    '''
+    Serve ``app``'s static files through the manifest built by
+    build_assets(), if there is one.
+    '''
+    static_assets = app.extensions['static_assets'] = StaticAssets()
+    static_assets.static_folder = app.static_folder
+    static_assets.manifest = load_manifest(app.static_folder)
+    static_assets.fallback = app.view_functions['static']
+    app.view_functions['static'] = static_assets.send
+    app.url_defaults(static_assets.url_defaults)
@@ -0,0 +1,131 @@
+import random
+from itertools import accumulate
+from datetime import datetime, timedelta
+
+from models import db, Artist, Venue, Show, Genre, artist_genres, venue_genres
+from bulk_import import insert_rows, allocate_ids, batches
+from counters import count_new_shows, rollover_shows
+from datetime_format import show_time_now
+
+#----------------------------------------------------------------------------#
+# Synthetic data.
+#----------------------------------------------------------------------------#
+
+# A deterministic catalog for benchmarks and the query plan guard: the same
+# seed and scale always produce the same rows. Show times are spread around
+# midnight of the day the data is generated, so the upcoming/past split is
+# the same whenever it is generated.
+
+ADJECTIVES = ('Blue', 'Golden', 'Electric', 'Velvet', 'Midnight', 'Silver',
+              'Crimson', 'Wild', 'Quiet', 'Neon', 'Rusty', 'Lucky')
+NOUNS = ('Moon', 'Fox', 'River', 'Harbor', 'Lantern', 'Owl', 'Pine',
+         'Comet', 'Anchor', 'Garden', 'Raven', 'Tiger')
+VENUE_KINDS = ('Hall', 'Club', 'Theater', 'Lounge', 'Bar', 'Arena')
+ARTIST_KINDS = ('Band', 'Trio', 'Quartet', 'Orchestra', 'Collective', 'Project')
+CITIES = (('San Francisco', 'CA'), ('New York', 'NY'), ('Austin', 'TX'),
+          ('Chicago', 'IL'), ('Seattle', 'WA'), ('Nashville', 'TN'),
+          ('New Orleans', 'LA'), ('Denver', 'CO'), ('Boston', 'MA'),
+          ('Atlanta', 'GA'))
+
+# Entities per show at the default scale: 1 venue per 20 shows, 1 artist
+# per 10
+SHOWS_PER_VENUE = 20
+SHOWS_PER_ARTIST = 10
+# Shows are spread over this many days before and after the anchor
+SHOW_SPREAD_DAYS = 365
+
+BATCH_SIZE = 5000
+
+VENUE_COLUMNS = ('id', 'name', 'city', 'state', 'address', 'phone', 'image_link',
+                 'facebook_link', 'website', 'seeking_talent', 'seeking_description')
+ARTIST_COLUMNS = ('id', 'name', 'city', 'state', 'phone', 'image_link',
+                  'facebook_link', 'website', 'seeking_venue', 'seeking_description')
+
+
+def scale(shows, venues=None, artists=None):
+    '''
+    Return (shows, venues, artists) for a number of shows, deriving the
+    entity counts that were not given.
+    '''
+    if venues is None:
+        venues = max(10, shows // SHOWS_PER_VENUE)
+    if artists is None:
+        artists = max(10, shows // SHOWS_PER_ARTIST)
+    return shows, venues, artists
+
+
+def _name(rng, kinds, number):
+    # Numbered, so that names stay unique at any scale
+    return '{} {} {} {}'.format(rng.choice(ADJECTIVES), rng.choice(NOUNS),
+                                rng.choice(kinds), number)
+
+
+def venue_row(rng, entity_id, number):
+    city, state = rng.choice(CITIES)
+    return (entity_id, _name(rng, VENUE_KINDS, number), city, state,
+            '{} {} St'.format(rng.randint(1, 9999), rng.choice(NOUNS)),
+            '{:03d}-{:03d}-{:04d}'.format(rng.randint(200, 999), rng.randint(0, 999), rng.randint(0, 9999)),
+            'https://images.example.com/venues/{}.jpg'.format(number),
+            'https://www.facebook.com/venue{}'.format(number),
+            'https://venue{}.example.com'.format(number),
+            rng.random() < 0.5, 'Looking for local acts' if rng.random() < 0.5 else None)
+
+
+def artist_row(rng, entity_id, number):
+    city, state = rng.choice(CITIES)
+    return (entity_id, _name(rng, ARTIST_KINDS, number), city, state,
+            '{:03d}-{:03d}-{:04d}'.format(rng.randint(200, 999), rng.randint(0, 999), rng.randint(0, 9999)),
+            'https://images.example.com/artists/{}.jpg'.format(number),
+            'https://www.facebook.com/artist{}'.format(number),
+            'https://artist{}.example.com'.format(number),
+            rng.random() < 0.5, 'Looking for gigs' if rng.random() < 0.5 else None)
+
+
+def _generate_entities(rng, model, columns, association_id, make_row, count, genre_ids):
+    ids = []
+    for batch in batches(range(1, count + 1), BATCH_SIZE):
+        batch_ids = allocate_ids(model, len(batch))
+        rows = [make_row(rng, entity_id, number) for entity_id, number in zip(batch_ids, batch)]
+        links = [(entity_id, genre_id) for entity_id in batch_ids
+                 for genre_id in rng.sample(genre_ids, rng.randint(1, 3))]
+        insert_rows(model.__table__, columns, rows)
+        insert_rows(association_id.table, (association_id.name, 'genre_id'), links)
+        db.session.commit()
+        ids.extend(batch_ids)
+    return ids
+
+
+def generate(shows=10000, venues=None, artists=None, seed=42, anchor=None):
+    '''
+    Insert a synthetic catalog of ``shows`` shows and, by default, one venue
+    per 20 and one artist per 10 of them. Returns (shows, venues, artists).
+    The database is expected to hold no venues or artists yet.
+    '''
+    shows, venues, artists = scale(shows, venues, artists)
+    rng = random.Random(seed)
+    if anchor is None:
+        anchor = datetime.combine(show_time_now().date(), datetime.min.time())
+    genre_ids = [genre_id for genre_id, in db.session.query(Genre.id).order_by(Genre.id)]
+
+    venue_ids = _generate_entities(rng, Venue, VENUE_COLUMNS, venue_genres.c.venue_id,
+                                   venue_row, venues, genre_ids)
+    artist_ids = _generate_entities(rng, Artist, ARTIST_COLUMNS, artist_genres.c.artist_id,
+                                    artist_row, artists, genre_ids)
+
+    # Skewed popularity: a few venues and artists get most of the shows
+    venue_weights = list(accumulate(1.0 / (rank + 1) ** 0.5 for rank in range(venues)))
+    artist_weights = list(accumulate(1.0 / (rank + 1) ** 0.5 for rank in range(artists)))
+    spread = SHOW_SPREAD_DAYS * 24 * 60
+    for batch in batches(range(shows), BATCH_SIZE):
+        rows = [(anchor + timedelta(minutes=rng.randint(-spread, spread)),
+                 artist_id, venue_id)
+                for artist_id, venue_id in zip(
+                    rng.choices(artist_ids, cum_weights=artist_weights, k=len(batch)),
+                    rng.choices(venue_ids, cum_weights=venue_weights, k=len(batch)))]
+        insert_rows(Show.__table__, ('start_time', 'artist_id', 'venue_id'), rows)
+        count_new_shows([(artist_id, venue_id, start_time) for start_time, artist_id, venue_id in rows])
+        db.session.commit()
+    # Counters start out with every show upcoming; move the started ones
+    rollover_shows()
+    db.session.commit()
+    return shows, venues, artists
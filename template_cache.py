@@ -0,0 +1,64 @@
+import hashlib
+import os
+import sys
+
+from jinja2 import FileSystemBytecodeCache
+
+#----------------------------------------------------------------------------#
+# Template bytecode cache.
+#----------------------------------------------------------------------------#
+
+# Jinja compiles a template to Python code on its first use in a process.
+# The compiled code is kept in TEMPLATE_CACHE_DIR, shared by every worker of
+# the host and kept across restarts, so a template is compiled once per
+# deploy, ideally at deploy time:
+#
+#   flask precompile-templates
+#
+# Entries are keyed by template and checked against a checksum of its
+# source and of the code of the Jinja extensions compiling it, such as
+# {% cache %}, so an edited template or extension is compiled again instead
+# of served stale.
+
+
+class ExtensionBytecodeCache(FileSystemBytecodeCache):
+    def __init__(self, directory, salt):
+        super().__init__(directory)
+        self.salt = salt
+
+    def get_source_checksum(self, source):
+        return hashlib.sha1((self.salt + source).encode('utf-8')).hexdigest()
+
+
+def extensions_digest(environment):
+    digest = hashlib.sha1()
+    for name in sorted(environment.extensions):
+        module = sys.modules[type(environment.extensions[name]).__module__]
+        with open(module.__file__, 'rb') as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+
+def precompile_templates(app):
+    '''
+    Load every template of ``app``, compiling those not in the bytecode cache
+    yet, and return their names.
+    '''
+    names = app.jinja_env.list_templates()
+    for name in names:
+        app.jinja_env.get_template(name)
+    return names
+
+
+def init_template_cache(app):
+    '''
+    Keep ``app``'s compiled templates in TEMPLATE_CACHE_DIR, unless empty.
+    Called after the extensions are added.
+    '''
+    directory = app.config['TEMPLATE_CACHE_DIR']
+    if not directory:
+        return
+    os.makedirs(directory, exist_ok=True)
+    # The environment checks its cache before the loader, so this takes
+    # effect for templates not loaded yet
+    app.jinja_env.bytecode_cache = ExtensionBytecodeCache(directory, extensions_digest(app.jinja_env))
@@ -0,0 +1,108 @@
+import os
+import shutil
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import pytest
+
+import config
+from app import create_app, init_migrate
+from counters import count_new_show
+from models import db, Artist, Venue, Show, Genre
+
+#----------------------------------------------------------------------------#
+# Fixtures.
+#----------------------------------------------------------------------------#
+
+# Every test runs against its own copy of a SQLite database migrated once
+# per session, never against DATABASE_URL.
+
+MIGRATIONS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'migrations')
+
+
+def make_config(directory):
+    # config.py, with the database and the files the app writes in
+    # ``directory``
+    settings = {name: getattr(config, name) for name in dir(config) if name.isupper()}
+    settings.update(
+        TESTING=True,
+        SQLALCHEMY_DATABASE_URI='sqlite:///' + os.path.join(directory, 'fyyur.db'),
+        SQLALCHEMY_BINDS={},
+        WTF_CSRF_ENABLED=False,
+        LOG_FILE=os.path.join(directory, 'error.log'),
+        SQL_PROFILE_LOG=os.path.join(directory, 'sql_profile.jsonl'),
+        SQL_PROFILE_SAMPLE_RATE=0,
+        FRAGMENT_CACHE_PATH='',
+        TEMPLATE_CACHE_DIR='',
+    )
+    return type('TestConfig', (), settings)
+
+
+@pytest.fixture(scope='session')
+def migrated_database(tmp_path_factory):
+    import flask_migrate
+    directory = str(tmp_path_factory.mktemp('migrated'))
+    app = create_app(make_config(directory))
+    init_migrate(app)
+    with app.app_context():
+        flask_migrate.upgrade(directory=MIGRATIONS)
+        db.engine.dispose()
+    return os.path.join(directory, 'fyyur.db')
+
+
+@pytest.fixture
+def app(migrated_database, tmp_path):
+    shutil.copy(migrated_database, str(tmp_path / 'fyyur.db'))
+    app = create_app(make_config(str(tmp_path)))
+    yield app
+    with app.app_context():
+        db.session.remove()
+        db.engine.dispose()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def catalog(app):
+    '''
+    Two venues and two artists. The first artist plays the first venue
+    twice, a show that has started and an upcoming one.
+    '''
+    with app.app_context():
+        genres = Genre.query.filter(Genre.name.in_(['Jazz', 'Blues'])).order_by(Genre.id).all()
+        venue = Venue(name='The Musical Hop', city='San Francisco', state='CA',
+                      address='1015 Folsom Street', genres=genres)
+        other_venue = Venue(name='The Dueling Pianos Bar', city='New York', state='NY',
+                            address='335 Delancey Street', genres=genres[:1])
+        artist = Artist(name='Guns N Petals', city='San Francisco', state='CA', genres=genres)
+        other_artist = Artist(name='The Wild Sax Band', city='San Francisco', state='CA', genres=genres[1:])
+        db.session.add_all([venue, other_venue, artist, other_artist])
+        db.session.commit()
+        now = datetime.now()
+        for start_time in (now - timedelta(days=3), now + timedelta(days=3)):
+            show = Show(artist_id=artist.id, venue_id=venue.id, start_time=start_time)
+            db.session.add(show)
+            count_new_show(show)
+        db.session.commit()
+        return SimpleNamespace(venue=venue.id, other_venue=other_venue.id,
+                               artist=artist.id, other_artist=other_artist.id)
+
+
+@pytest.fixture
+def edit(client):
+    '''
+    Post the edit form of a venue or artist (``kind``) with the given fields
+    changed, and follow the redirect as a browser would, showing the flash.
+    '''
+    def edit(kind, entity_id, **changes):
+        form = {'name': 'Edited', 'city': 'San Francisco', 'state': 'CA', 'address': '1 Main St',
+                'phone': '415-555-0100', 'image_link': '', 'facebook_link': '', 'genres': ['Jazz'],
+                'website_link': '', 'seeking_description': ''}
+        form.update(changes)
+        response = client.post('/{}s/{}/edit'.format(kind, entity_id), data=form)
+        assert response.status_code == 302
+        return client.get(response.location)
+    return edit
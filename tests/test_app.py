@@ -0,0 +1,23 @@
+import gc
+import weakref
+
+from app import create_app
+
+
+def test_apps_keep_their_own_configuration(app):
+    other_app = create_app(type('OtherConfig', (), dict(
+        app.config, DATETIME_TIMEZONE='Europe/Berlin', ENTITY_CACHE_TTL=5, QUERY_CONCURRENCY=2)))
+    assert app.extensions['datetime_format'].timezone == ''
+    assert other_app.extensions['datetime_format'].timezone == 'Europe/Berlin'
+    assert [cache.ttl for cache in app.extensions['entity_cache'].values()] == [60, 60]
+    assert other_app.extensions['query_pool'].size == 2
+    for name in ('fragment_cache', 'conditional', 'static_assets', 'query_pool'):
+        assert app.extensions[name] is not other_app.extensions[name]
+    assert app.jinja_env.filters['fragment_cache_get'] == app.extensions['fragment_cache'].get
+
+
+def test_apps_are_freed(app):
+    # Nothing process-wide, such as an at-fork hook, holds on to an app
+    other_app = weakref.ref(create_app(type('OtherConfig', (), dict(app.config))))
+    gc.collect()
+    assert other_app() is None
@@ -0,0 +1,119 @@
+import zlib
+
+from werkzeug.test import EnvironBuilder
+
+from compression import CompressionMiddleware
+
+PAGE = b'<p>The Musical Hop</p>' * 100
+
+
+def wsgi_app(status='200 OK', headers=(('Content-Type', 'text/html; charset=utf-8'),), chunks=(PAGE,),
+             length=True):
+    def app(environ, start_response):
+        response_headers = list(headers)
+        if length:
+            response_headers.append(('Content-Length', str(sum(map(len, chunks)))))
+        start_response(status, response_headers)
+        return iter(chunks)
+    return app
+
+
+def call(app, accept_encoding=None, method='GET'):
+    environ = EnvironBuilder(method=method, headers={'Accept-Encoding': accept_encoding}
+                             if accept_encoding is not None else {}).get_environ()
+    started = {}
+
+    def start_response(status, headers, exc_info=None):
+        started.update(status=status, headers=dict(headers))
+        return lambda data: None
+    chunks = list(CompressionMiddleware(app)(environ, start_response))
+    return started['status'], started['headers'], chunks
+
+
+def encoding_of(accept_encoding):
+    return call(wsgi_app(), accept_encoding)[1].get('Content-Encoding')
+
+
+def test_negotiates_the_preferred_accepted_encoding():
+    preferred = CompressionMiddleware(None).encodings[0]
+    assert encoding_of('gzip') == 'gzip'
+    assert encoding_of('deflate, gzip;q=0.5') == 'deflate'
+    assert encoding_of('gzip;q=0, deflate') == 'deflate'
+    assert encoding_of('*') == preferred
+    assert encoding_of('gzip;q=0, *') == ('deflate' if preferred == 'gzip' else preferred)
+
+
+def test_falls_back_to_identity():
+    for accept_encoding in (None, '', 'identity', 'gzip;q=0, deflate;q=0, br;q=0', '*;q=0'):
+        status, headers, chunks = call(wsgi_app(), accept_encoding)
+        assert 'Content-Encoding' not in headers
+        assert b''.join(chunks) == PAGE
+        assert headers['Vary'] == 'Accept-Encoding'
+
+
+def test_compresses_with_the_negotiated_encoding():
+    status, headers, chunks = call(wsgi_app(), 'gzip')
+    assert 'Content-Length' not in headers
+    assert zlib.decompress(b''.join(chunks), 31) == PAGE
+    status, headers, chunks = call(wsgi_app(), 'deflate')
+    assert zlib.decompress(b''.join(chunks)) == PAGE
+
+
+def test_skips_small_and_already_encoded_bodies():
+    small = call(wsgi_app(chunks=(b'<p>Hop</p>',)), 'gzip')
+    assert 'Content-Encoding' not in small[1]
+    assert small[2] == [b'<p>Hop</p>']
+
+    precompressed = zlib.compress(PAGE)
+    encoded = call(wsgi_app(headers=(('Content-Type', 'text/html'), ('Content-Encoding', 'deflate')),
+                            chunks=(precompressed,)), 'gzip')
+    assert encoded[1]['Content-Encoding'] == 'deflate'
+    assert b''.join(encoded[2]) == precompressed
+
+    image = call(wsgi_app(headers=(('Content-Type', 'image/png'),)), 'gzip')
+    assert 'Content-Encoding' not in image[1]
+    assert 'Vary' not in image[1]
+
+
+def test_flushes_every_chunk_of_a_streamed_response():
+    rows = [b'{"id": %d, "name": "The Musical Hop"}\n' % i for i in range(50)]
+    status, headers, chunks = call(wsgi_app(headers=(('Content-Type', 'application/x-ndjson'),),
+                                            chunks=rows, length=False), 'gzip')
+    assert headers['Content-Encoding'] == 'gzip'
+    decompressor = zlib.decompressobj(31)
+    # Each chunk decompresses to its row as soon as it arrives
+    for row, chunk in zip(rows, chunks):
+        assert decompressor.decompress(chunk) == row
+    assert decompressor.decompress(b''.join(chunks[len(rows):])) == b''
+    assert decompressor.eof
+
+
+def test_weakens_etags_and_varies_on_accept_encoding():
+    headers = (('Content-Type', 'text/html'), ('ETag', '"c0ffee"'), ('Vary', 'Cookie'))
+    status, compressed, chunks = call(wsgi_app(headers=headers), 'gzip')
+    assert compressed['ETag'] == 'W/"c0ffee"'
+    assert compressed['Vary'] == 'Cookie, Accept-Encoding'
+
+    status, identity, chunks = call(wsgi_app(headers=headers), 'identity')
+    assert identity['ETag'] == '"c0ffee"'
+    assert identity['Vary'] == 'Cookie, Accept-Encoding'
+
+    # A 304 stands for the compressed response, and has no Content-Type
+    not_modified = wsgi_app('304 Not Modified', (('ETag', '"c0ffee"'),), chunks=(), length=False)
+    status, headers, chunks = call(not_modified, 'gzip')
+    assert headers['ETag'] == 'W/"c0ffee"'
+    assert headers['Vary'] == 'Accept-Encoding'
+    assert 'Content-Encoding' not in headers
+    assert b''.join(chunks) == b''
+
+
+def test_compressed_pages_revalidate(client, catalog):
+    gzip = {'Accept-Encoding': 'gzip'}
+    first = client.get('/venues', headers=gzip)
+    assert first.headers['Content-Encoding'] == 'gzip'
+    assert first.headers['ETag'].startswith('W/')
+    assert b'The Musical Hop' in zlib.decompress(first.data, 31)
+    revalidated = client.get('/venues', headers=dict(gzip, **{'If-None-Match': first.headers['ETag']}))
+    assert revalidated.status_code == 304
+    assert revalidated.headers['ETag'] == first.headers['ETag']
+    assert revalidated.headers['Vary'] == 'Accept-Encoding'
@@ -0,0 +1,100 @@
+import shutil
+from datetime import datetime, timedelta
+
+import queries
+from app import create_app
+from counters import count_new_show
+from models import db, Show
+
+
+def revalidate(client, url, response):
+    return client.get(url, headers={'If-None-Match': response.headers['ETag']})
+
+
+def test_listing_is_not_modified_until_a_write(client, catalog):
+    first = client.get('/venues')
+    assert first.status_code == 200
+    assert revalidate(client, '/venues', first).status_code == 304
+
+    client.post('/venues/create', data={
+        'name': 'Park Square Live Music & Coffee', 'city': 'San Francisco', 'state': 'CA',
+        'address': '34 Whiskey Moore Ave', 'phone': '', 'image_link': '', 'facebook_link': '',
+        'genres': ['Jazz'], 'website_link': '', 'seeking_description': ''})
+    created = revalidate(client, '/venues', first)
+    assert created.status_code == 200
+    assert b'Park Square' in created.data
+
+    client.delete('/venues/{}'.format(catalog.other_venue), follow_redirects=True)
+    deleted = revalidate(client, '/venues', created)
+    assert deleted.status_code == 200
+    assert b'Dueling Pianos' not in deleted.data
+
+
+def test_shows_listing_follows_artist_edits(client, catalog, edit):
+    first = client.get('/shows')
+    edit('artist', catalog.artist, name='Roses N Guns')
+    edited = revalidate(client, '/shows', first)
+    assert edited.status_code == 200
+    assert b'Roses N Guns' in edited.data
+
+
+def test_detail_page_is_not_modified_until_edited(client, catalog, edit):
+    url = '/venues/{}'.format(catalog.venue)
+    first = client.get(url)
+    assert first.status_code == 200
+    assert revalidate(client, url, first).status_code == 304
+
+    edit('venue', catalog.venue, name='The Musical Hop Annex')
+    edited = revalidate(client, url, first)
+    assert edited.status_code == 200
+    assert edited.headers['ETag'] != first.headers['ETag']
+    assert b'The Musical Hop Annex' in edited.data
+
+
+def test_if_modified_since_sees_a_show_start(app, client, catalog, monkeypatch):
+    url = '/artists/{}'.format(catalog.other_artist)
+    with app.app_context():
+        show = Show(artist_id=catalog.other_artist, venue_id=catalog.venue,
+                    start_time=datetime.now() + timedelta(hours=1))
+        db.session.add(show)
+        count_new_show(show)
+        db.session.commit()
+    first = client.get(url)
+    since = {'If-Modified-Since': first.headers['Last-Modified']}
+    assert client.get(url, headers=since).status_code == 304
+
+    # Two hours later the show has started, with no write in between
+    later = datetime.now() + timedelta(hours=2)
+    monkeypatch.setattr(queries, 'show_time_now', lambda: later)
+    started = client.get(url, headers=since)
+    assert started.status_code == 200
+    assert started.headers['Last-Modified'] != first.headers['Last-Modified']
+
+
+def test_detail_page_of_a_row_deleted_elsewhere_is_not_served(app, client, catalog):
+    url = '/venues/{}'.format(catalog.other_venue)
+    assert client.get(url).status_code == 200
+    # Deleted by another worker, whose cache invalidation this one never sees
+    with app.app_context():
+        db.session.execute(db.text('DELETE FROM "VenueGenre" WHERE venue_id = :id'), {'id': catalog.other_venue})
+        db.session.execute(db.text('DELETE FROM "Venue" WHERE id = :id'), {'id': catalog.other_venue})
+        db.session.commit()
+    assert client.get(url).status_code == 302
+
+
+def test_edited_templates_change_etags_with_auto_reload(app, catalog, tmp_path):
+    debug_app = create_app(type('DebugConfig', (), dict(app.config, TEMPLATES_AUTO_RELOAD=True)))
+    templates = str(tmp_path / 'templates')
+    shutil.copytree(debug_app.jinja_loader.searchpath[0], templates)
+    debug_app.jinja_loader.searchpath[0] = templates
+    client = debug_app.test_client()
+    first = client.get('/venues')
+    assert revalidate(client, '/venues', first).status_code == 304
+    fragment_digest = debug_app.extensions['fragment_cache'].digest
+
+    page = tmp_path / 'templates' / 'pages' / 'venues.html'
+    page.write_text(page.read_text().replace('{% block content %}', '{% block content %}<!-- edited -->'))
+    edited = revalidate(client, '/venues', first)
+    assert edited.status_code == 200
+    assert b'<!-- edited -->' in edited.data
+    assert debug_app.extensions['fragment_cache'].digest != fragment_digest
@@ -0,0 +1,91 @@
+import time
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from bulk_import import import_shows
+from counters import rollover_shows
+from models import db, Artist, Venue, Show
+
+
+def counts(model, entity_id):
+    entity = db.session.get(model, entity_id)
+    return entity.upcoming_shows_count, entity.past_shows_count
+
+
+@pytest.fixture
+def tokyo(monkeypatch):
+    # A server whose local time is not UTC
+    monkeypatch.setenv('TZ', 'Asia/Tokyo')
+    time.tzset()
+    yield
+    monkeypatch.undo()
+    time.tzset()
+
+
+def test_shows_are_counted_when_created(app, catalog):
+    with app.app_context():
+        assert counts(Artist, catalog.artist) == (1, 1)
+        assert counts(Venue, catalog.venue) == (1, 1)
+
+
+def test_rollover_moves_each_show_once(app, catalog):
+    with app.app_context():
+        now = datetime.now()
+        assert rollover_shows(now) == 0
+        assert rollover_shows(now + timedelta(days=1)) == 0
+        assert rollover_shows(now + timedelta(days=4)) == 1
+        db.session.commit()
+        assert counts(Artist, catalog.artist) == (0, 2)
+        assert counts(Venue, catalog.venue) == (0, 2)
+
+
+def test_new_shows_are_counted_against_the_watermark(app, client, catalog):
+    for start_time in (datetime.now() + timedelta(days=7), datetime.now() - timedelta(days=7)):
+        client.post('/shows/create', data={
+            'artist_id': catalog.other_artist, 'venue_id': catalog.other_venue,
+            'start_time': start_time.strftime('%Y-%m-%d %H:%M:%S')})
+    with app.app_context():
+        assert counts(Artist, catalog.other_artist) == (1, 1)
+        assert counts(Venue, catalog.other_venue) == (1, 1)
+
+
+def test_deleting_a_venue_uncounts_its_shows(app, client, catalog):
+    client.delete('/venues/{}'.format(catalog.venue))
+    with app.app_context():
+        assert db.session.get(Venue, catalog.venue) is None
+        assert counts(Artist, catalog.artist) == (0, 0)
+
+
+def test_imported_show_times_with_an_offset_are_counted(app, catalog):
+    start_time = datetime.now(timezone(timedelta(hours=-8)))
+    with app.app_context():
+        import_shows([
+            {'artist_id': catalog.other_artist, 'venue_id': catalog.other_venue,
+             'start_time': (start_time + timedelta(days=7)).isoformat()},
+            {'artist_id': catalog.other_artist, 'venue_id': catalog.other_venue,
+             'start_time': (start_time - timedelta(days=7)).isoformat()},
+        ], batch_size=10)
+        assert counts(Artist, catalog.other_artist) == (1, 1)
+        assert rollover_shows(datetime.now() + timedelta(days=8)) == 2
+
+
+def test_show_times_with_an_offset_are_stored_as_local_time(app, client, catalog, tokyo):
+    with app.app_context():
+        import_shows([{'artist_id': catalog.other_artist, 'venue_id': catalog.other_venue,
+                       'start_time': '2026-05-01T20:00-08:00'}], batch_size=10)
+    client.post('/shows/create', data={
+        'artist_id': catalog.artist, 'venue_id': catalog.other_venue,
+        'start_time': '2026-05-01T21:00:00-08:00'})
+    with app.app_context():
+        assert [show.start_time for show in Show.query.filter_by(venue_id=catalog.other_venue).order_by(
+            Show.start_time)] == [datetime(2026, 5, 2, 13, 0), datetime(2026, 5, 2, 14, 0)]
+        assert counts(Venue, catalog.other_venue) == (0, 2)
+
+
+def test_show_times_are_stored_in_the_configured_zone(app, catalog):
+    app.config['SHOW_TIMEZONE'] = 'America/New_York'
+    with app.app_context():
+        import_shows([{'artist_id': catalog.other_artist, 'venue_id': catalog.other_venue,
+                       'start_time': '2026-05-01T20:00-08:00'}], batch_size=10)
+        assert Show.query.filter_by(venue_id=catalog.other_venue).one().start_time == datetime(2026, 5, 2, 0, 0)
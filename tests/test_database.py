@@ -0,0 +1,18 @@
+from flask import g
+
+
+def test_searches_read_from_the_replica_without_sticking_to_the_primary(app, client, catalog):
+    app.config['SQLALCHEMY_BINDS'] = {'replica': app.config['SQLALCHEMY_DATABASE_URI']}
+    with client:
+        searched = client.post('/venues/search', data={'search_term': 'Hop'})
+        assert b'The Musical Hop' in searched.data
+        assert g.use_replica
+    assert 'Set-Cookie' not in searched.headers
+
+    created = client.post('/artists/create', data={
+        'name': 'Matt Quevedo', 'city': 'New York', 'state': 'NY', 'phone': '', 'image_link': '',
+        'facebook_link': '', 'genres': ['Jazz'], 'website_link': '', 'seeking_description': ''})
+    assert 'Set-Cookie' in created.headers
+    with client:
+        client.get('/artists')
+        assert not g.use_replica
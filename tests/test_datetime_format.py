@@ -0,0 +1,27 @@
+from datetime import datetime
+
+from datetime_format import DateTimeFormatter, show_time_now, show_time_to_utc
+
+
+def formatter(show_timezone):
+    format_datetime = DateTimeFormatter()
+    format_datetime.show_timezone = show_timezone
+    return format_datetime
+
+
+def test_show_times_are_shown_as_stored():
+    start_time = datetime(2026, 5, 1, 20, 0)
+    assert formatter('America/New_York')(start_time, 'HH:mm') == '20:00'
+
+
+def test_show_times_are_converted_from_their_zone():
+    start_time = datetime(2026, 5, 1, 20, 0)
+    assert formatter('America/New_York')(start_time, 'HH:mm', tz='Europe/Berlin') == '02:00'
+    assert formatter('Asia/Tokyo')(start_time, 'HH:mm', tz='Europe/Berlin') == '13:00'
+
+
+def test_show_time_helpers_follow_the_configured_zone(app):
+    app.config['SHOW_TIMEZONE'] = 'Asia/Tokyo'
+    with app.app_context():
+        assert show_time_to_utc(datetime(2026, 5, 1, 20, 0)) == datetime(2026, 5, 1, 11, 0)
+        assert abs((show_time_to_utc(show_time_now()) - datetime.utcnow()).total_seconds()) < 60
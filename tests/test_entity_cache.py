@@ -0,0 +1,25 @@
+from datetime import datetime
+
+from models import db, Venue
+
+
+def test_entity_cache_drops_committed_edits(app, client, catalog, edit):
+    url = '/venues/{}'.format(catalog.venue)
+    venue_cache = app.extensions['entity_cache'][Venue]
+    assert b'The Musical Hop' in client.get(url).data
+    assert catalog.venue in venue_cache.entries
+    assert b'Park Square' in edit('venue', catalog.venue, name='Park Square').data
+    assert venue_cache.entries[catalog.venue][1]['name'] == 'Park Square'
+
+
+def test_detail_page_sees_writes_of_other_processes(app, client, catalog):
+    url = '/venues/{}'.format(catalog.venue)
+    first = client.get(url)
+    # Written behind the session's back, as another worker would
+    with app.app_context():
+        db.session.execute(db.text('UPDATE "Venue" SET name = :name, updated_at = :now WHERE id = :id'),
+                           {'name': 'Park Square', 'now': datetime.utcnow(), 'id': catalog.venue})
+        db.session.commit()
+    changed = client.get(url, headers={'If-None-Match': first.headers['ETag']})
+    assert changed.status_code == 200
+    assert b'Park Square' in changed.data
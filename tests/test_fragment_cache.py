@@ -0,0 +1,33 @@
+from fragment_cache import FragmentCache, LRUStore, SQLiteStore
+
+
+def test_listing_tiles_follow_edits(client, catalog, edit):
+    assert b'Guns N Petals' in client.get('/artists').data
+    assert b'Guns N Petals' in client.get('/shows').data
+    edit('artist', catalog.artist, name='Roses N Guns')
+    for url in ('/artists', '/shows'):
+        page = client.get(url).data
+        assert b'Roses N Guns' in page
+        assert b'Guns N Petals' not in page
+
+
+def test_fragment_is_stored_under_the_key_it_was_looked_up_with():
+    cache = FragmentCache(LRUStore())
+    key = cache.key('pages/artists.html', ['artist', 1])
+    assert cache.get(key) is None
+    # An edit while the tile renders
+    cache.invalidate('artist', 1)
+    cache.set(key, 'Guns N Petals')
+    assert cache.get(cache.key('pages/artists.html', ['artist', 1])) is None
+
+
+def test_shared_store_invalidates_other_workers(tmp_path):
+    path = str(tmp_path / 'fragments.db')
+    worker, other_worker = FragmentCache(SQLiteStore(path)), FragmentCache(SQLiteStore(path))
+    key = worker.key('pages/artists.html', ['artist', 1])
+    worker.set(key, 'Guns N Petals')
+    other_worker.sync()
+    assert other_worker.get(other_worker.key('pages/artists.html', ['artist', 1])) == 'Guns N Petals'
+    worker.invalidate('artist', 1)
+    other_worker.sync()
+    assert other_worker.get(other_worker.key('pages/artists.html', ['artist', 1])) is None
@@ -0,0 +1,13 @@
+from models import db
+from query_plans import check_query_plans
+from synthetic_data import generate
+
+
+def test_no_route_scans_a_large_table(app):
+    with app.app_context():
+        generate(2000, 200, 200)
+        db.session.remove()
+    violations = check_query_plans(app)
+    assert not violations, '\n\n'.join(
+        '{} {} ({}) scans {}:\n{}\n{}'.format(method, url, endpoint, ', '.join(tables), statement, plan)
+        for method, url, endpoint, tables, statement, plan in violations)
@@ -0,0 +1,42 @@
+import json
+import time
+import types
+
+from flask import Response
+
+from replay import InProcessTarget, read_log, replay
+from sql_profiler import RequestProfile
+
+
+def test_log_is_streamed_and_writes_without_data_are_skipped(app, catalog, tmp_path):
+    log = tmp_path / 'requests.jsonl'
+    log.write_text('\n'.join(json.dumps(record) for record in (
+        {'method': 'GET', 'path': '/venues'},
+        {'method': 'POST', 'path': '/venues/search', 'data': {'search_term': 'Hop'}},
+        {'method': 'POST', 'path': '/shows/create'},
+        {'method': 'GET', 'path': '/artists'},
+    )) + '\n')
+    records = read_log(str(log), limit=3)
+    assert isinstance(records, types.GeneratorType)
+    stats = replay(app, records, concurrency=2)
+    assert stats.skipped == 1
+    assert {endpoint: result['requests'] for endpoint, result in stats.report().items()} == {
+        'venues.venues': 1, 'venues.search_venues': 1, '*': 2}
+
+
+def test_open_loop_latency_counts_time_behind_schedule(app, monkeypatch):
+    def slow_target(self, method, path, data):
+        time.sleep(0.05)
+        return 200
+    monkeypatch.setattr(InProcessTarget, '__call__', slow_target)
+    # 100 requests per second scheduled, 20 per second served
+    stats = replay(app, [('GET', '/', None)] * 5, concurrency=1, rate=100)
+    assert stats.report()['*']['p99_ms'] >= 150
+
+
+def test_profile_records_replay_searches_with_their_form(app):
+    with app.test_request_context('/venues/search', method='POST', data={'search_term': 'Hop'}):
+        record = RequestProfile().record_for(Response(), 10)
+    assert record['data'] == {'search_term': ['Hop']}
+    with app.test_request_context('/venues/create', method='POST', data={'name': 'Park Square'}):
+        assert 'data' not in RequestProfile().record_for(Response(), 10)
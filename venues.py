@@ -0,0 +1,283 @@
+from flask import Blueprint, current_app, flash, redirect, render_template, request, url_for
+
+from database import read_only
+from models import db, Artist, Venue, Show, venue_genres
+from search import ranked_matches
+from search_index import venue_index
+from counters import uncount_shows
+from fragment_cache import fragment_cache
+from entity_cache import venue_cache
+from conditional import conditional
+from datetime_format import show_time_now
+from concurrent_queries import gather
+from log_pipeline import log_payload
+from queries import genres_named, filter_by_genre, listing_validators, detail_validators
+
+#----------------------------------------------------------------------------#
+# Venues.
+#----------------------------------------------------------------------------#
+
+# The WTForms forms (forms.py) are imported by the views that render them,
+# on first use, see create_app() in app.py
+
+bp = Blueprint('venues', __name__)
+
+
+@bp.route('/venues')
+def venues():
+    # Venues grouped by city/state, in a single round trip, optionally for
+    # one genre only. Upcoming show counts are read from the row (see
+    # counters.py) instead of aggregated.
+    not_modified = conditional(*listing_validators(Venue))
+    if not_modified:
+        return not_modified
+    query = db.session.query(
+        Venue.id,
+        Venue.name,
+        Venue.city,
+        Venue.state,
+        Venue.upcoming_shows_count
+    )
+    genre = request.args.get('genre')
+    if genre:
+        query = filter_by_genre(query, Venue.id, venue_genres.c.venue_id, genre)
+    rows = query.order_by(
+        Venue.city, Venue.state, Venue.id
+    ).all()
+
+    venues_data = []
+    # Rows are ordered by city/state, so a new area starts whenever it changes
+    for venue_id, name, city, state, num_upcoming_shows in rows:
+        if not venues_data or (venues_data[-1]['city'], venues_data[-1]['state']) != (city, state):
+            venues_data.append({
+                "venues": [],
+                "city": city,
+                "state": state
+            })
+        venues_data[-1]['venues'].append({
+            "id": venue_id,
+            "name": name,
+            "num_upcoming_shows": num_upcoming_shows
+        })
+    return render_template('pages/venues.html', areas=venues_data)
+
+
+@bp.route('/venues/search', methods=['POST'])
+@read_only
+def search_venues():
+    # Case-insensitive partial match on name, city and state, answered from
+    # the search indexes (see search.py) and ranked by relevance. An
+    # optional genre narrows down all matches, not just the best
+    # SEARCH_RESULT_LIMIT.
+    search_term = request.form.get('search_term', '')
+    matches = ranked_matches(Venue, search_term, genre=request.form.get('genre'))
+    venues = db.session.query(
+        Venue.id,
+        Venue.name,
+        Venue.upcoming_shows_count
+    ).join(matches, matches.c.id == Venue.id).order_by(matches.c.rank, Venue.id).all()
+    search_res = {
+        "count": 0,
+        "data": []
+    }
+    for venue_id, name, num_upcoming_shows in venues:
+        v_obj = {
+            "id": venue_id,
+            "name": name,
+            "num_upcoming_shows": num_upcoming_shows
+        }
+        search_res["data"].append(v_obj)
+    search_res['count'] = len(search_res['data'])
+    return render_template('pages/search_venues.html', results=search_res, search_term=search_term)
+
+
+@bp.route('/venues/<int:venue_id>')
+def show_venue(venue_id):
+    # shows the venue page with the given venue_id
+    # The venue comes from the entity cache; its shows, with the artist
+    # columns the page needs, from one JOINed query, run alongside the
+    # load of a venue missing from the cache (see concurrent_queries.py).
+    validators = detail_validators(Venue, Show.venue_id, venue_id)
+    if validators is None:
+        # Not even a cached copy is served for a row that is gone
+        flash('Venue not found!', 'error')
+        return redirect('/venues')
+    not_modified = conditional(*validators)
+    if not_modified:
+        return not_modified
+    # The version the ETag was built from
+    updated_at = validators[1]
+    shows = db.session.query(
+        Show.start_time,
+        Artist.id,
+        Artist.name,
+        Artist.image_link
+    ).join(Show.artist).filter(
+        Show.venue_id == venue_id
+    ).order_by(Show.start_time).all
+    data = venue_cache.peek(venue_id, updated_at)
+    if data is None:
+        rows, data = gather(shows, lambda: venue_cache.get(venue_id, updated_at))
+    else:
+        rows = shows()
+    if data is None:
+        # Deleted since the validators were read
+        flash('Venue not found!', 'error')
+        return redirect('/venues')
+
+    now = show_time_now()
+    past_shows = []
+    upcoming_shows = []
+    for start_time, artist_id, artist_name, artist_image_link in rows:
+        show = {
+            "artist_id": artist_id,
+            "artist_name": artist_name,
+            "artist_image_link": artist_image_link,
+            "start_time": start_time
+        }
+        if start_time > now:
+            upcoming_shows.append(show)
+        else:
+            past_shows.append(show)
+
+    data["past_shows"] = past_shows
+    data["upcoming_shows"] = upcoming_shows
+    data['past_shows_count'] = len(past_shows)
+    data['upcoming_shows_count'] = len(upcoming_shows)
+
+    return render_template('pages/show_venue.html', venue=data)
+
+#  Create Venue
+#  ----------------------------------------------------------------
+
+
+@bp.route('/venues/create', methods=['GET'])
+def create_venue_form():
+    from forms import VenueForm
+    form = VenueForm()
+    return render_template('forms/new_venue.html', form=form)
+
+
+@bp.route('/venues/create', methods=['POST'])
+def create_venue_submission():
+    # TODO: insert form data as a new Venue record in the db, instead
+    # TODO: modify data to be the data object returned from db insertion
+    from forms import VenueForm
+    form = VenueForm()
+
+    # on successful db insert, flash success
+    try:
+        data = request.form
+        venue = Venue(
+            name=data['name'],
+            address=data['address'],
+            city=data['city'],
+            state=data['state'],
+            phone=data['phone'],
+            image_link=data['image_link'],
+            facebook_link=data['facebook_link'],
+            genres=genres_named(data.getlist('genres')),
+            website=data['website_link'],
+            seeking_description=data['seeking_description'],
+            #FIXME: Issue with dynamic data
+            seeking_talent=True
+        )
+
+        db.session.add(venue)
+        db.session.commit()
+        venue_index.add(venue)
+
+        log_payload(current_app.logger, 'New venue form', data)
+
+        flash('New venue ' +
+              request.form['name'] +
+              ' was successfully created!')
+
+    # TODO: on unsuccessful db insert, flash an error instead.
+    except:
+        db.session.rollback()
+        flash('An error occurred. New venue ' +
+              request.form['name'] + ' could not be created.')
+        current_app.logger.exception('Could not create venue')
+        return render_template('forms/new_venue.html', form=form)
+    finally:
+        db.session.close()
+    # e.g., flash('An error occurred. Venue ' + data.name + ' could not be listed.')
+    # see: http://flask.pocoo.org/docs/1.0/patterns/flashing/
+    return render_template('pages/home.html')
+
+
+@bp.route('/venues/<int:venue_id>', methods=['DELETE'])
+def delete_venue(venue_id):
+    # Deletes the venue together with its shows, which would otherwise
+    # violate the Show.venue_id foreign key.
+    try:
+        venue = db.session.query(Venue).filter(Venue.id == venue_id).first()
+        if not venue:
+            flash('Venue not found!', 'error')
+            return redirect('/venues')
+        venue_name = venue.name
+        uncount_shows(Show.venue_id == venue_id)
+        Show.query.filter_by(venue_id=venue_id).delete()
+        db.session.delete(venue)
+        db.session.commit()
+        venue_index.remove(venue_id)
+        fragment_cache.invalidate('venue', venue_id)
+
+        flash("Venue {0} has been deleted successfully".format(venue_name))
+    except:
+        db.session.rollback()
+        flash('An error occurred. Venue ' +
+              str(venue_id) + ' could not be deleted.')
+        current_app.logger.exception('Could not delete venue %s', venue_id)
+    finally:
+        db.session.close()
+    # BONUS CHALLENGE: Implement a button to delete a Venue on a Venue Page, have it so that
+    # clicking that button delete it from the db then redirect the user to the homepage
+    return redirect(url_for('main.index'))
+
+@bp.route('/venues/<int:venue_id>/edit', methods=['GET'])
+def edit_venue(venue_id):
+    from forms import VenueForm
+    form = VenueForm()
+    venue = venue_cache.get(venue_id)
+    # TODO: populate form with values from venue with ID <venue_id>
+    return render_template('forms/edit_venue.html', form=form, venue=venue)
+
+
+@bp.route('/venues/<int:venue_id>/edit', methods=['POST'])
+def edit_venue_submission(venue_id):
+    # TODO: take values from the form submitted, and update existing
+    # venue record with ID <venue_id> using the new attributes
+    try:
+        venue = db.session.query(Venue).filter(
+            Venue.id == venue_id).first()
+        form_data = request.form
+        venue.name = form_data['name']
+        venue.city = form_data['city']
+        venue.state = form_data['state']
+        venue.phone = form_data['phone']
+        venue.genres = genres_named(form_data.getlist('genres'))
+        venue.image_link = form_data['image_link']
+        venue.facebook_link = form_data['facebook_link']
+        venue.website = form_data['website_link']
+        #FIXME: Issue with dynamic data
+        venue.seeking_talent = True
+        venue.seeking_description = form_data['seeking_description']
+
+        log_payload(current_app.logger, 'Edited venue form', form_data)
+        # on successful db insert, flash success
+        db.session.add(venue)
+        db.session.commit()
+        venue_index.update(venue)
+        fragment_cache.invalidate('venue', venue_id)
+        flash('Venue ' + request.form['name'] + ' was successfully updated!')
+    except:
+        db.session.rollback()
+        flash('An error occurred. Venue ' +
+              request.form['name'] + ' could not be updated.')
+        current_app.logger.exception('Could not update venue %s', venue_id)
+    finally:
+        db.session.close()
+
+    return redirect(url_for('venues.show_venue', venue_id=venue_id))
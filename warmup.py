@@ -0,0 +1,50 @@
+from models import db, Artist, Venue
+from entity_cache import venue_cache, artist_cache
+from template_cache import precompile_templates
+
+#----------------------------------------------------------------------------#
+# Warmup.
+#----------------------------------------------------------------------------#
+
+# Everything a cold process would otherwise do on its first requests. Run in
+# the master process before it forks the workers (see gunicorn.conf.py),
+# the compiled templates, search indexes and caches are shared by all of
+# them, copy-on-write.
+
+# Pages requested once, which builds the search indexes, fills the fragment
+# cache with the listing tiles and imports the forms (see app.py)
+WARMUP_PAGES = ('/', '/venues', '/artists', '/shows', '/venues/create', '/artists/create', '/shows/create')
+
+
+def warm_up(app):
+    '''
+    Load every template of ``app`` (see template_cache.py), load the
+    WARMUP_ENTITIES most popular venues and artists into the entity caches
+    and request WARMUP_PAGES plus the pages of the most popular venue and
+    artist. Closes the connections
+    it used, as they must not be shared with forked workers.
+    '''
+    precompile_templates(app)
+
+    paths = list(WARMUP_PAGES)
+    with app.app_context():
+        count = app.config['WARMUP_ENTITIES']
+        for model, cache, prefix in ((Venue, venue_cache, '/venues/'), (Artist, artist_cache, '/artists/')):
+            popular = db.session.query(model.id).order_by(
+                model.upcoming_shows_count.desc(), model.id
+            ).limit(count).all()
+            for entity_id, in popular:
+                cache.get(entity_id)
+            # The detail pages also load the date formatting data
+            paths.extend(prefix + str(entity_id) for entity_id, in popular[:1])
+        db.session.remove()
+
+    client = app.test_client()
+    for path in paths:
+        response = client.get(path)
+        response.get_data()
+        if response.status_code != 200:
+            app.logger.warning('Warmup request to %s returned %d', path, response.status_code)
+
+    with app.app_context():
+        db.dispose_pools(app)